@@ -1,29 +1,290 @@
+"""Incremental training for the fraud model.
+
+Labeled transactions are streamed in chunks from CSV/JSONL/Parquet files
+and, with --feedback, from the users' YES/NO verdicts in the Transactions
+table. Each chunk grows a warm-started random forest by a few trees, so
+memory is bounded by the chunk size and retraining on new feedback only
+fits trees for the new rows instead of re-fitting everything.
+
+Every run writes a new version directory under --output-dir:
+
+    models/v0003/fraud_bundle.joblib    flattened forest, category codes and feature schema
+    models/v0003/training_model.joblib  the scikit-learn forest, to warm-start the next version
+    models/v0003/manifest.json          parent version, rows, sources, metrics
+    models/LATEST                       name of the newest version
+
+The bundle is the only file FraudDetectionLambda needs (see
+PhishNetCommon/phishnet/model_bundle.py). The forest is exported to flat
+arrays (PhishNetCommon/phishnet/forest.py) and checked to predict exactly
+like the scikit-learn model before it is saved. Category codes are
+append-only and 0 is reserved for values the model has never seen.
+
+Usage:
+    python TrainingModel.py --data transactions.csv
+    python TrainingModel.py --from latest --feedback     # add only new verdicts
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime, timezone
+
+import joblib
+import numpy as np
 import pandas as pd
-from sklearn.model_selection import train_test_split
 from sklearn.ensemble import RandomForestClassifier
-from sklearn.preprocessing import LabelEncoder
-from sklearn.metrics import classification_report
-import joblib
+from sklearn.metrics import classification_report, precision_recall_fscore_support
+
+# The feature schema and bundle format are shared with FraudDetectionLambda through the PhishNetCommon layer
+HERE = os.path.dirname(os.path.abspath(__file__))
+for root in (HERE, os.path.dirname(HERE)):
+    if os.path.isdir(os.path.join(root, 'PhishNetCommon')):
+        sys.path.insert(0, os.path.join(root, 'PhishNetCommon'))
+        break
+
+from phishnet import forest, model_bundle, storage
+from phishnet.model_bundle import CATEGORICAL_FEATURES, FEATURES, UNKNOWN_CODE
+
+# Verdicts HandleUserResponse writes to the Transactions Status field
+FEEDBACK_LABELS = {"FRAUD": 1, "Not Fraud": 0}
+SIMULATED_FRAUD_AMOUNT = 350  # label used when a file has no IsFraud column
+
+TRAINING_MODEL_FILE = "training_model.joblib"
+MANIFEST_FILE = "manifest.json"
+LATEST_FILE = "LATEST"
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--data', action='append', default=[], help="CSV, JSONL or Parquet file of labeled transactions (repeatable)")
+    parser.add_argument('--feedback', action='store_true', help="also train on user verdicts from the Transactions table")
+    parser.add_argument('--table', default='Transactions', help="DynamoDB table holding the verdicts")
+    parser.add_argument('--from', dest='parent', help="version to continue from ('latest' or e.g. v0003)")
+    parser.add_argument('--output-dir', default='models', help="where versioned artifacts are written")
+    parser.add_argument('--chunk-size', type=int, default=200_000, help="rows per training chunk")
+    parser.add_argument('--trees-per-chunk', type=int, default=5, help="trees added to the forest per chunk")
+    parser.add_argument('--max-trees', type=int, default=200, help="oldest trees are dropped past this size")
+    parser.add_argument('--holdout', type=float, default=0.2, help="share of each chunk kept back for evaluation")
+    parser.add_argument('--max-holdout-rows', type=int, default=500_000, help="cap on evaluation rows kept in memory")
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+    if not args.data and not args.feedback:
+        args.data = ['results.csv']
+    return args
+
+
+def file_chunks(path, chunk_size):
+    """Yield DataFrames of at most chunk_size rows from a CSV, JSONL or Parquet file"""
+    if path.endswith('.parquet'):
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+    elif path.endswith(('.jsonl', '.json')):
+        yield from pd.read_json(path, lines=True, chunksize=chunk_size)
+    else:
+        yield from pd.read_csv(path, chunksize=chunk_size)
+
+
+def feedback_chunks(table_name, chunk_size, reviewed_after=None):
+    """Yield DataFrames of transactions users have answered YES/NO for.
+
+    Only verdicts recorded after `reviewed_after` (an ISO timestamp) are read,
+    so continuing from an earlier version only trains on the new feedback.
+    """
+    from boto3.dynamodb.conditions import Attr
+
+    # PHISHNET_STORAGE=memory trains against the in-process tables instead of DynamoDB
+    table = storage.table(table_name)
+    condition = Attr('Status').is_in(list(FEEDBACK_LABELS))
+    if reviewed_after:
+        condition = condition & Attr('ReviewedAt').gt(reviewed_after)
+    # Status and Location are DynamoDB reserved words, so every projected name is aliased
+    names = {f"#a{i}": name for i, name in enumerate(['Status', 'ReviewedAt', *FEATURES])}
+    scan_kwargs = {
+        'FilterExpression': condition,
+        'ProjectionExpression': ', '.join(names),
+        'ExpressionAttributeNames': names,
+    }
+
+    rows = []
+    while True:
+        response = table.scan(**scan_kwargs)
+        rows.extend(response.get('Items', []))
+        while len(rows) >= chunk_size:
+            yield pd.DataFrame(rows[:chunk_size])
+            rows = rows[chunk_size:]
+        if 'LastEvaluatedKey' not in response:
+            break
+        scan_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+    if rows:
+        yield pd.DataFrame(rows)
+
+
+def labels_for(frame):
+    """IsFraud when the data has it, else the user's verdict, else the simulated amount rule"""
+    if 'IsFraud' in frame.columns:
+        return frame['IsFraud'].astype(int).to_numpy()
+    if 'Status' in frame.columns and frame['Status'].isin(list(FEEDBACK_LABELS)).all():
+        return frame['Status'].map(FEEDBACK_LABELS).to_numpy()
+    return (frame['Amount'].astype(float) > SIMULATED_FRAUD_AMOUNT).astype(int).to_numpy()
+
+
+def encode_features(frame, vocabulary):
+    """Feature matrix for a chunk. New category values get the next free code, so
+    codes already used by earlier trees never change. Missing values get UNKNOWN_CODE."""
+    columns = [frame['Amount'].astype(float).to_numpy()]
+    for column in CATEGORICAL_FEATURES:
+        mapping = vocabulary.setdefault(column, {})
+        values = frame[column] if column in frame.columns else pd.Series(index=frame.index, dtype=object)
+        values = values.where(values.isna(), values.astype(str))
+        for value in values.dropna().unique():
+            if value not in mapping:
+                mapping[value] = len(mapping) + 1  # 0 stays reserved for unknown
+        columns.append(values.map(mapping).fillna(UNKNOWN_CODE).to_numpy(dtype=float))
+    return np.column_stack(columns)
+
+
+def load_version(output_dir, version):
+    """(model, vocabulary, manifest) of an earlier version"""
+    if version == 'latest':
+        with open(os.path.join(output_dir, LATEST_FILE)) as f:
+            version = f.read().strip()
+    bundle = model_bundle.load(os.path.join(output_dir, version, model_bundle.BUNDLE_FILE), mmap_mode=None)
+    model = joblib.load(os.path.join(output_dir, version, TRAINING_MODEL_FILE))
+    return model, model_bundle.mappings(bundle), bundle['metadata']
+
+
+def next_version(output_dir):
+    existing = [int(name[1:]) for name in os.listdir(output_dir) if name.startswith('v') and name[1:].isdigit()] \
+        if os.path.isdir(output_dir) else []
+    return f"v{max(existing, default=0) + 1:04d}"
+
+
+def train(model, chunks, vocabulary, args):
+    """Grow the forest by args.trees_per_chunk trees per chunk. Returns (model, stats, holdout)"""
+    rng = np.random.default_rng(args.seed)
+    stats = {'rows': 0, 'chunks': 0, 'skipped_rows': 0}
+    holdout_X, holdout_y = [], []
+    holdout_rows = 0
+    pending = None  # chunks with a single class wait for the next one
+
+    for frame in chunks:
+        # Label each chunk from its own source before it can be merged with another
+        frame = frame.assign(IsFraud=labels_for(frame))
+        if pending is not None:
+            frame = pd.concat([pending, frame], ignore_index=True)
+            pending = None
+        y = frame['IsFraud'].to_numpy()
+        # Every tree has to see both classes, or its predict_proba columns won't line up
+        if len(np.unique(y)) < 2:
+            pending = frame
+            continue
+        X = encode_features(frame, vocabulary)
+
+        held = rng.random(len(y)) < args.holdout
+        if holdout_rows < args.max_holdout_rows:
+            holdout_X.append(X[held])
+            holdout_y.append(y[held])
+            holdout_rows += int(held.sum())
+        X, y = X[~held], y[~held]
+        if len(np.unique(y)) < 2:
+            stats['skipped_rows'] += len(y)
+            continue
+
+        if model is None:
+            model = RandomForestClassifier(warm_start=True, n_jobs=-1, random_state=args.seed)
+        model.n_estimators = len(getattr(model, 'estimators_', [])) + args.trees_per_chunk
+        model.fit(X, y)
+        if len(model.estimators_) > args.max_trees:
+            model.estimators_ = model.estimators_[-args.max_trees:]
+            model.n_estimators = args.max_trees
+
+        stats['rows'] += len(y)
+        stats['chunks'] += 1
+        print(f"Chunk {stats['chunks']}: {len(y)} rows, forest has {len(model.estimators_)} trees")
+
+    if pending is not None:
+        stats['skipped_rows'] += len(pending)
+        print(f"Skipped {len(pending)} trailing rows with a single class")
+    holdout = (np.concatenate(holdout_X), np.concatenate(holdout_y)) if holdout_X else None
+    return model, stats, holdout
+
+
+def evaluate(model, holdout):
+    if holdout is None or not len(holdout[1]):
+        return {}
+    X, y = holdout
+    predicted = model.predict(X)
+    print(classification_report(y, predicted, zero_division=0))
+    precision, recall, f1, _ = precision_recall_fscore_support(y, predicted, average='binary', zero_division=0)
+    return {'holdout_rows': int(len(y)), 'precision': precision, 'recall': recall, 'f1': f1}
+
+
+def export_forest(model, holdout):
+    """Flatten the forest for the detector and check it predicts exactly like the original"""
+    arrays = forest.flatten(model)
+    if holdout is not None and len(holdout[1]):
+        X = holdout[0]
+        mismatches = int((forest.FlatForest(arrays).predict(X) != model.predict(X)).sum())
+        if mismatches:
+            raise RuntimeError(f"Flattened forest disagrees with the model on {mismatches} of {len(X)} holdout rows")
+        print(f"Flattened forest matches the model on all {len(X)} holdout rows")
+    return arrays
+
+
+def save_version(output_dir, version, model, vocabulary, manifest, forest_arrays):
+    path = os.path.join(output_dir, version)
+    os.makedirs(path)
+    model_bundle.save(model_bundle.build(forest_arrays, vocabulary, version, manifest),
+                      os.path.join(path, model_bundle.BUNDLE_FILE))
+    joblib.dump(model, os.path.join(path, TRAINING_MODEL_FILE))
+    with open(os.path.join(path, MANIFEST_FILE), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    with open(os.path.join(output_dir, LATEST_FILE), 'w') as f:
+        f.write(version)
+    print(f"Saved model {version} to {path}")
 
-df = pd.read_csv("results.csv")
 
-# Simulate fraud labels if not available
-if 'IsFraud' not in df.columns:
-    df['IsFraud'] = (df['Amount'] > 350).astype(int)
+def main():
+    args = parse_args()
+    start = time.perf_counter()
 
-# Encode categorical fields
-for col in ['Merchant', 'Category', 'PaymentMethod', 'Location']:
-    df[col] = LabelEncoder().fit_transform(df[col])
+    model, vocabulary, parent = None, {}, None
+    if args.parent:
+        model, vocabulary, parent = load_version(args.output_dir, args.parent)
+        print(f"Continuing from {parent['version']} ({len(model.estimators_)} trees)")
 
-# Split into features and target
-X = df[['Amount', 'Merchant', 'Category', 'PaymentMethod', 'Location']]
-y = df['IsFraud']
+    def chunks():
+        for path in args.data:
+            yield from file_chunks(path, args.chunk_size)
+        if args.feedback:
+            yield from feedback_chunks(args.table, args.chunk_size, parent and parent.get('feedback_through'))
 
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+    started_at = datetime.now(timezone.utc).isoformat()
+    model, stats, holdout = train(model, chunks(), vocabulary, args)
+    if not stats['rows']:
+        print("No new rows with both fraud and non-fraud labels; nothing to train")
+        return
 
-model = RandomForestClassifier(n_estimators=100, random_state=42)
-model.fit(X_train, y_train)
+    version = next_version(args.output_dir)
+    manifest = {
+        'version': version,
+        'parent': parent['version'] if parent else None,
+        'created_at': datetime.now(timezone.utc).isoformat(),
+        'features': FEATURES,
+        'schema_hash': model_bundle.schema_hash(),
+        'trees': len(model.estimators_),
+        'sources': args.data + ([f"dynamodb:{args.table}"] if args.feedback else []),
+        'rows_trained': stats['rows'],
+        'rows_trained_total': stats['rows'] + (parent['rows_trained_total'] if parent else 0),
+        # Verdicts recorded before this run started are in the model
+        'feedback_through': started_at if args.feedback else (parent or {}).get('feedback_through'),
+        'metrics': evaluate(model, holdout),
+        'training_seconds': round(time.perf_counter() - start, 2),
+    }
+    save_version(args.output_dir, version, model, vocabulary, manifest, export_forest(model, holdout))
 
-print(classification_report(y_test, model.predict(X_test)))
 
-joblib.dump(model, "fraud_model.pkl")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
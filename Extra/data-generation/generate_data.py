@@ -1,130 +1,331 @@
-import json
-import random
-import uuid
+import argparse
+import os
 import datetime
-import pandas as pd
-from faker import Faker
-import boto3
+import multiprocessing
+from collections import deque
 from decimal import Decimal
 
-# Initialize faker
-fake = Faker()
+import numpy as np
+from faker import Faker
 
 # AWS setup (uncomment when ready to upload to DynamoDB)
+# import boto3
 # dynamodb = boto3.resource('dynamodb', region_name='us-east-2')
 # transactions_table = dynamodb.Table('Transactions')
 # users_table = dynamodb.Table('Users')  # If you have a Users table
 
-def generate_users(num_users=100):
+MERCHANTS = [
+    "Amazon", "Walmart", "Target", "Starbucks", "McDonald's",
+    "Best Buy", "Apple Store", "Gas Station", "Grocery Store",
+    "Restaurant", "Hotel", "Airline", "Online Service"
+]
+CATEGORIES = ["Shopping", "Food", "Travel", "Entertainment", "Utilities", "Other"]
+PAYMENT_METHODS = ["Credit Card", "Debit Card", "Mobile Payment", "Online"]
+
+FRAUD_RATE = 0.1         # share of transactions that are potential fraud
+FRAUD_AWAY_RATE = 0.7    # share of those that happen away from the user's home
+IDENTITY_POOL_SIZE = 2000  # Faker values drawn once per run to build users from
+LOCATION_POOL_SIZE = 500  # "City, ST" values fraud is drawn from away from home
+DEFAULT_CHUNK_SIZE = 100_000
+
+# Columns of a transaction as stored in DynamoDB; training files also get IsFraud
+TRANSACTION_COLUMNS = ['TransactionID', 'UserID', 'Amount', 'Timestamp', 'Merchant',
+                       'Location', 'Category', 'PaymentMethod', 'Status']
+
+# IDs are row numbers pushed through a bijection, so they look random but never
+# collide, however many rows a run produces
+ID_BITS = 40  # transaction IDs; user IDs use 32
+ID_MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)
+PHONE_MULTIPLIER = 7_654_321  # coprime with 8,000,000, so subscriber numbers don't repeat
+DIGITS = np.frombuffer(b'0123456789abcdef', dtype=np.uint8)
+
+
+def as_seed_sequence(seed):
+    """Accepts an int, None or a SeedSequence, so callers can hand out independent child seeds"""
+    return seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+
+
+def identity_pools(pool_size, seed_sequence):
+    """Faker values drawn once per run; users are built by combining them"""
+    local_fake = Faker()
+    local_fake.seed_instance(int(seed_sequence.generate_state(1)[0]))
+
+    def draw(provider):
+        return np.array([provider() for _ in range(pool_size)])
+
+    return {
+        'FirstName': draw(local_fake.first_name),
+        'LastName': draw(local_fake.last_name),
+        'Street': draw(local_fake.street_address),
+        'City': draw(local_fake.city),
+        'State': draw(local_fake.state_abbr),
+        'Zip': draw(local_fake.zipcode),
+        'Domain': np.array(sorted({local_fake.free_email_domain() for _ in range(50)})),
+    }
+
+
+def digit_strings(values, width, base=10):
+    """Zero-padded decimal or hex strings of non-negative ints, built without a
+    per-value Python call (np.char.mod costs about 1us a value)"""
+    values = np.asarray(values, dtype=np.uint64)
+    powers = np.uint64(base) ** np.arange(width - 1, -1, -1, dtype=np.uint64)
+    digits = DIGITS[(values[:, None] // powers) % np.uint64(base)]
+    return digits.view(f'S{width}').ravel().astype(f'U{width}')
+
+
+def scrambled_ids(start, size, salt, bits):
+    """Row numbers pushed through a bijection of the `bits`-bit space, as `bits // 4` hex digits:
+    random-looking, never colliding"""
+    index = np.arange(start, start + size, dtype=np.uint64)
+    ids = (index * ID_MULTIPLIER + salt) & np.uint64((1 << bits) - 1)
+    return digit_strings(ids, bits // 4, base=16)
+
+
+def time_window(start):
+    """(first, last) epoch seconds from `start` up to now, truncated to the hour so
+    a seeded run gives the same output all hour"""
+    now = datetime.datetime.now().replace(minute=0, second=0, microsecond=0)
+    epoch = datetime.datetime(1970, 1, 1)
+    return int((start(now) - epoch).total_seconds()), int((now - epoch).total_seconds())
+
+
+def random_timestamps(rng, window, size):
+    seconds = rng.integers(window[0], window[1] + 1, size)
+    return np.datetime_as_string(seconds.astype('datetime64[s]'), unit='s')
+
+
+def generate_user_columns(num_users=100, seed=None, pool_size=IDENTITY_POOL_SIZE):
+    """Generate fake users as a dict of NumPy columns.
+
+    Names, streets, cities and so on come from small Faker pools combined at
+    random, so the cost of Faker does not grow with the number of users.
+    IDs, emails and phone numbers are derived from the row number and stay
+    unique (phone numbers up to 8 million users).
+    """
+    root = as_seed_sequence(seed)
+    pool_seed, id_seed, sample_seed = root.spawn(3)
+    pools = identity_pools(pool_size, pool_seed)
+    rng = np.random.default_rng(sample_seed)
+    index = np.arange(num_users)
+
+    def pick(name):
+        return pools[name][rng.integers(0, len(pools[name]), num_users)]
+
+    first, last = pick('FirstName'), pick('LastName')
+    street, city, state, zip_code = pick('Street'), pick('City'), pick('State'), pick('Zip')
+    # Home is precomputed here so transaction generation never has to parse addresses
+    home = np.char.add(np.char.add(city, ', '), state)
+
+    # NANP-shaped numbers: a random area code, then a unique 7-digit subscriber number
+    area_code = rng.integers(201, 990, num_users)
+    subscriber = 2_000_000 + (index * PHONE_MULTIPLIER + int(rng.integers(8_000_000))) % 8_000_000
+
+    user_hex = scrambled_ids(0, num_users, np.uint64(id_seed.generate_state(1, np.uint64)[0]), 32)
+    # The user ID's hex part keeps emails unique
+    mailbox = np.char.lower(np.char.add(np.char.add(first, '.'), last))
+    mailbox = np.char.add(np.char.add(mailbox, '.'), np.char.add(user_hex, '@'))
+
+    return {
+        'UserID': np.char.add('user_', user_hex),
+        'Name': np.char.add(np.char.add(first, ' '), last),
+        'Email': np.char.add(mailbox, pick('Domain')),
+        'Phone': np.char.add(np.char.add('+1', digit_strings(area_code, 3)), digit_strings(subscriber, 7)),
+        'Address': np.char.add(np.char.add(street, '\n'), np.char.add(np.char.add(home, ' '), zip_code)),
+        'HomeLocation': home,
+        'AccountCreated': random_timestamps(rng, time_window(lambda now: now.replace(month=1, day=1, hour=0)), num_users),
+        'CreditScore': rng.integers(300, 851, num_users),
+        'TypicalSpendingPattern': np.array(['Low', 'Medium', 'High'])[rng.integers(0, 3, num_users)],
+        'AverageTransactionAmount': np.round(rng.uniform(10, 500, num_users), 2),
+    }
+
+
+def generate_users(num_users=100, seed=None):
     """Generate a list of fake users"""
-    users = []
-    for _ in range(num_users):
-        user_id = f"user_{uuid.uuid4().hex[:8]}"
-        user = {
-            'UserID': user_id,
-            'Name': fake.name(),
-            'Email': fake.email(),
-            'Phone': fake.phone_number(),
-            'Address': fake.address(),
-            'AccountCreated': fake.date_time_this_year().isoformat(),
-            'CreditScore': random.randint(300, 850),
-            'TypicalSpendingPattern': random.choice(['Low', 'Medium', 'High']),
-            'AverageTransactionAmount': round(random.uniform(10, 500), 2)
-        }
-        users.append(user)
-    return users
-
-def generate_transactions(users, num_transactions=1000):
+    columns = generate_user_columns(num_users, seed)
+    values = [np.asarray(column).tolist() for column in columns.values()]
+    return [dict(zip(columns, row)) for row in zip(*values)]
+
+
+def sampling_context(users, seed_sequence):
+    """Per-run arrays the transaction sampler reads, built once and shared by every chunk.
+
+    `users` is either the columns from generate_user_columns or a list of user dicts.
+    """
+    if isinstance(users, list):
+        users = {name: np.array([user[name] for user in users]) for name in ('UserID', 'AverageTransactionAmount', 'HomeLocation')}
+    local_fake = Faker()
+    local_fake.seed_instance(int(seed_sequence.generate_state(1)[0]))
+
+    return {
+        'UserID': np.asarray(users['UserID']),
+        'AverageAmount': np.asarray(users['AverageTransactionAmount'], dtype=float),
+        'Home': np.asarray(users['HomeLocation']),
+        'Locations': np.array([f"{local_fake.city()}, {local_fake.state_abbr()}" for _ in range(LOCATION_POOL_SIZE)]),
+        'TimeRange': time_window(lambda now: now.replace(day=1, hour=0)),
+        'IdSalt': np.uint64(seed_sequence.generate_state(1, np.uint64)[0]),
+    }
+
+
+def sample_transactions(context, start, size, seed_sequence):
+    """One chunk of transactions as a dict of equal-length NumPy columns"""
+    rng = np.random.default_rng(seed_sequence)
+    user_index = rng.integers(0, len(context['UserID']), size)
+
+    # Determine which transactions are potential fraud (10% chance)
+    is_fraud = rng.random(size) < FRAUD_RATE
+
+    # Fraudulent transactions have higher amounts, normal ones follow the user's average
+    base_amount = context['AverageAmount'][user_index]
+    amount = np.where(is_fraud,
+                      rng.uniform(1000, 5000, size),
+                      rng.uniform(0.5 * base_amount, 2 * base_amount))
+
+    # Most fraud happens away from the user's home
+    home = context['Home'][user_index]
+    away = is_fraud & (rng.random(size) < FRAUD_AWAY_RATE)
+    elsewhere = context['Locations'][rng.integers(0, len(context['Locations']), size)]
+
+    return {
+        'TransactionID': np.char.add('txn_', scrambled_ids(start, size, context['IdSalt'], ID_BITS)),
+        'UserID': context['UserID'][user_index],
+        'Amount': np.round(amount, 2),
+        'Timestamp': random_timestamps(rng, context['TimeRange'], size),
+        'Merchant': np.array(MERCHANTS)[rng.integers(0, len(MERCHANTS), size)],
+        'Location': np.where(away, elsewhere, home),
+        'Category': np.array(CATEGORIES)[rng.integers(0, len(CATEGORIES), size)],
+        'PaymentMethod': np.array(PAYMENT_METHODS)[rng.integers(0, len(PAYMENT_METHODS), size)],
+        'Status': np.full(size, "Pending"),  # Initial status, would be updated by fraud detection system
+        'IsFraud': is_fraud.astype(np.int8),
+    }
+
+
+# Worker processes receive the sampling context once, when the pool starts
+_worker_context = None
+
+
+def _init_worker(context):
+    global _worker_context
+    _worker_context = context
+
+
+def _sample_in_worker(task):
+    return sample_transactions(_worker_context, *task)
+
+
+def generate_transaction_chunks(users, num_transactions, chunk_size=DEFAULT_CHUNK_SIZE, seed=None, workers=1):
+    """Yield transactions in chunks of at most chunk_size rows, in order.
+
+    Every chunk gets its own seed spawned from `seed`, so the output is the
+    same for a given seed no matter how many worker processes produce it.
+    """
+    root = as_seed_sequence(seed)
+    context = sampling_context(users, root.spawn(1)[0])
+    starts = range(0, num_transactions, chunk_size)
+    tasks = [(start, min(chunk_size, num_transactions - start), chunk_seed)
+             for start, chunk_seed in zip(starts, root.spawn(len(starts)))]
+
+    if workers <= 1:
+        for task in tasks:
+            yield sample_transactions(context, *task)
+        return
+
+    # Keep a couple of chunks in flight per worker so memory stays bounded
+    # when writing is slower than sampling
+    with multiprocessing.Pool(workers, initializer=_init_worker, initargs=(context,)) as pool:
+        pending = deque()
+        for task in tasks:
+            pending.append(pool.apply_async(_sample_in_worker, (task,)))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().get()
+        while pending:
+            yield pending.popleft().get()
+
+
+def generate_transactions(users, num_transactions=1000, seed=None):
     """Generate fake transactions for users"""
     transactions = []
-    merchants = [
-        "Amazon", "Walmart", "Target", "Starbucks", "McDonald's", 
-        "Best Buy", "Apple Store", "Gas Station", "Grocery Store",
-        "Restaurant", "Hotel", "Airline", "Online Service"
-    ]
-    
-    for _ in range(num_transactions):
-        # Randomly select a user
-        user = random.choice(users)
-        user_id = user['UserID']
-        
-        # Determine if this should be a fraudulent transaction (10% chance)
-        is_potential_fraud = random.random() < 0.1
-        
-        # Generate transaction amount based on user's typical spending pattern
-        if is_potential_fraud:
-            # Fraudulent transactions have higher amounts
-            amount = round(random.uniform(1000, 5000), 2)
-        else:
-            # Normal transactions based on user's average
-            base_amount = user['AverageTransactionAmount']
-            amount = round(random.uniform(0.5 * base_amount, 2 * base_amount), 2)
-        
-        # Generate transaction timestamp
-        timestamp = fake.date_time_this_month().isoformat()
-        
-        # Generate location (sometimes different for fraudulent transactions)
-        if is_potential_fraud and random.random() < 0.7:
-            # Location different from user's address
-            location = fake.city() + ", " + fake.state_abbr()
-        else:
-            # Extract city and state from user's address
-            address_parts = user['Address'].split('\n')
-            if len(address_parts) > 1:
-                location = address_parts[1]
-            else:
-                location = fake.city() + ", " + fake.state_abbr()
-        
-        transaction = {
-            'TransactionID': f"txn_{uuid.uuid4().hex[:10]}",
-            'UserID': user_id,
-            'Amount': amount,
-            'Timestamp': timestamp,
-            'Merchant': random.choice(merchants),
-            'Location': location,
-            'Category': random.choice(["Shopping", "Food", "Travel", "Entertainment", "Utilities", "Other"]),
-            'PaymentMethod': random.choice(["Credit Card", "Debit Card", "Mobile Payment", "Online"]),
-            'Status': "Pending"  # Initial status, would be updated by fraud detection system
-        }
-        
-        transactions.append(transaction)
-    
+    for chunk in generate_transaction_chunks(users, num_transactions, seed=seed):
+        columns = [chunk[name].tolist() for name in TRANSACTION_COLUMNS]
+        transactions.extend(dict(zip(TRANSACTION_COLUMNS, values)) for values in zip(*columns))
     return transactions
 
-def save_to_files(users, transactions):
-    """Save generated data to JSON files"""
-    with open('users.json', 'w') as f:
-        json.dump(users, f, indent=2)
-    
-    with open('transactions.json', 'w') as f:
-        json.dump(transactions, f, indent=2)
-    
-    # Also save as CSV for easy viewing
-    pd.DataFrame(users).to_csv('users.csv', index=False)
-    pd.DataFrame(transactions).to_csv('transactions.csv', index=False)
-    
-    print(f"Generated {len(users)} users and {len(transactions)} transactions")
-    print("Data saved to users.json, transactions.json, users.csv, and transactions.csv")
+
+def write_chunks(chunks, path, file_format):
+    """Write column chunks to path as they arrive; returns the number of rows written"""
+    rows = 0
+    if file_format == 'parquet':
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        writer = None
+        try:
+            for chunk in chunks:
+                table = pa.table(chunk)
+                if writer is None:
+                    writer = pq.ParquetWriter(path, table.schema)
+                writer.write_table(table)
+                rows += table.num_rows
+        finally:
+            if writer is not None:
+                writer.close()
+        return rows
+
+    import pandas as pd
+
+    with open(path, 'w', newline='') as f:
+        for chunk in chunks:
+            frame = pd.DataFrame(chunk)
+            if file_format == 'csv':
+                frame.to_csv(f, header=(rows == 0), index=False)
+            else:
+                frame.to_json(f, orient='records', lines=True)
+            rows += len(frame)
+    return rows
+
 
 def upload_to_dynamodb(transactions):
     """Upload transactions to DynamoDB"""
     # Convert float amounts to Decimal for DynamoDB
     for transaction in transactions:
         transaction['Amount'] = Decimal(str(transaction['Amount']))
-    
+
     with transactions_table.batch_writer() as batch:
         for transaction in transactions:
             batch.put_item(Item=transaction)
-    
+
     print(f"Uploaded {len(transactions)} transactions to DynamoDB")
 
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Generate synthetic users and transactions")
+    parser.add_argument('--users', type=int, default=100, help="number of users")
+    parser.add_argument('--transactions', type=int, default=1000, help="number of transactions")
+    parser.add_argument('--format', choices=['csv', 'jsonl', 'parquet'], default='csv', help="output file format")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help="transactions generated and written at a time")
+    parser.add_argument('--workers', type=int, default=1, help="generator processes (0 = one per CPU)")
+    parser.add_argument('--seed', type=int, help="seed for reproducible output")
+    parser.add_argument('--output-dir', default='.', help="where to write the files")
+    return parser.parse_args()
+
+
 if __name__ == "__main__":
+    args = parse_args()
+    users_seed, transactions_seed = np.random.SeedSequence(args.seed).spawn(2)
+    workers = args.workers or os.cpu_count()
+    os.makedirs(args.output_dir, exist_ok=True)
+    users_path = os.path.join(args.output_dir, f"users.{args.format}")
+    transactions_path = os.path.join(args.output_dir, f"transactions.{args.format}")
+
     # Generate fake data
-    users = generate_users(100)  # 100 users
-    transactions = generate_transactions(users, 1000)  # 1000 transactions
-    
-    # Save to files
-    save_to_files(users, transactions)
-    
+    users = generate_user_columns(args.users, users_seed)
+    write_chunks([users], users_path, args.format)
+
+    # Transactions are streamed to disk chunk by chunk, so size is limited by disk, not memory
+    chunks = generate_transaction_chunks(users, args.transactions, args.chunk_size, transactions_seed, workers)
+    written = write_chunks(chunks, transactions_path, args.format)
+
+    print(f"Generated {args.users} users and {written} transactions")
+    print(f"Data saved to {users_path} and {transactions_path}")
+
     # Uncomment to upload to DynamoDB when ready
-    # upload_to_dynamodb(transactions)
\ No newline at end of file
+    # upload_to_dynamodb(generate_transactions(generate_users(100), 1000))
@@ -1,12 +1,12 @@
-import boto3
 import base64
 import urllib.parse
-from boto3.dynamodb.conditions import Key
+from datetime import datetime, timezone
+from phishnet import clients, locations
 
-# DynamoDB Tables
-map_table = boto3.resource('dynamodb').Table("UserFraudTransactionsMap")
-txn_table = boto3.resource('dynamodb').Table("Transactions")
-user_table = boto3.resource('dynamodb').Table("Users")
+# DynamoDB Tables (one shared resource, created on first use)
+map_table = clients.table("UserFraudTransactionsMap")
+txn_table = clients.table("Transactions")
+user_table = clients.table("Users")
 
 def lambda_handler(event, context):
     print(f"Received event: {event}")
@@ -23,16 +23,20 @@ def lambda_handler(event, context):
 
     print(f"SMS received from {sender}: '{sms_body}'")
 
-    # Handle "travel - {location}" to enable travel mode
+    # Handle "travel - {location}" to enable travel mode.
+    # Travel mode changes bump ProfileVersion so FraudDetectionLambda notices its cached profile is stale.
     if sms_body.startswith('travel -'):
         try:
-            location = sms_body.split('travel -')[1].strip().title()
+            # Typos and aliases are stored as the city they mean ("tokoyo" -> "Tokyo")
+            requested = sms_body.split('travel -')[1].strip()
+            location = locations.canonical_name(requested) or requested.title()
             user_table.update_item(
                 Key={'User_ID': sender},
-                UpdateExpression="SET TravelMode = :val, TravelLocation = :loc",
+                UpdateExpression="SET TravelMode = :val, TravelLocation = :loc ADD ProfileVersion :one",
                 ExpressionAttributeValues={
                     ":val": True,
-                    ":loc": location
+                    ":loc": location,
+                    ":one": 1
                 }
             )
             print(f"Enabled travel mode for {sender} to {location}")
@@ -46,9 +50,10 @@ def lambda_handler(event, context):
         try:
             user_table.update_item(
                 Key={'User_ID': sender},
-                UpdateExpression="SET TravelMode = :val REMOVE TravelLocation",
+                UpdateExpression="SET TravelMode = :val REMOVE TravelLocation ADD ProfileVersion :one",
                 ExpressionAttributeValues={
-                    ":val": False
+                    ":val": False,
+                    ":one": 1
                 }
             )
             print(f"Disabled travel mode for {sender}")
@@ -72,12 +77,12 @@ def lambda_handler(event, context):
         return respond("No recent fraud alert found for your number.")
 
     try:
-        # Update the Transactions table
+        # Update the Transactions table; ReviewedAt lets training pick up only new verdicts
         txn_table.update_item(
             Key={'TransactionID': transaction_id},
-            UpdateExpression="SET #s = :val",
+            UpdateExpression="SET #s = :val, ReviewedAt = :now",
             ExpressionAttributeNames={"#s": "Status"},
-            ExpressionAttributeValues={":val": new_status}
+            ExpressionAttributeValues={":val": new_status, ":now": datetime.now(timezone.utc).isoformat()}
         )
         print(f"Updated transaction {transaction_id} to '{new_status}'")
 
@@ -103,7 +108,8 @@ def lambda_handler(event, context):
 def get_latest_pending_transaction(phone_number):
     try:
         result = map_table.query(
-            KeyConditionExpression=Key('PhoneNumber').eq(phone_number),
+            KeyConditionExpression="PhoneNumber = :phone",
+            ExpressionAttributeValues={":phone": phone_number},
             ScanIndexForward=False,
             Limit=5
         )
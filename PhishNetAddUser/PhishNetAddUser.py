@@ -1,14 +1,11 @@
 import json
-import boto3
 import random
 import uuid
+from phishnet import clients
 from datetime import datetime
 
-# AWS Clients
-dynamodb = boto3.resource('dynamodb')
-
-# Set DynamoDB Table
-DYNAMODB_TABLE = dynamodb.Table("Users")
+# Set DynamoDB Table (created on first use)
+DYNAMODB_TABLE = clients.table("Users")
 
 # Predefined users
 USER_LIST = [
@@ -0,0 +1,64 @@
+"""Lazily constructed clients shared by the Lambda handlers.
+
+Importing boto3 or twilio and building their clients is a large part of a
+cold start, and many invocations never need them (e.g. a batch with no
+fraud never touches Twilio). Handlers bind module-level names to Lazy
+proxies instead; the real client is built on first attribute access and
+then reused for the life of the container.
+"""
+import os
+import threading
+
+from phishnet import storage
+
+
+class Lazy:
+    """Proxy that builds its target with factory() on first use"""
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._target = None
+        self._lock = threading.Lock()
+
+    def resolve(self):
+        if self._target is None:
+            with self._lock:
+                if self._target is None:
+                    self._target = self._factory()
+        return self._target
+
+    def __getattr__(self, name):
+        return getattr(self.resolve(), name)
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def _shared(name, factory):
+    with _clients_lock:
+        if name not in _clients:
+            _clients[name] = factory()
+        return _clients[name]
+
+
+def table(name):
+    """A table handle that isn't created (and doesn't import boto3) until used"""
+    return Lazy(lambda: storage.table(name))
+
+
+def sqs():
+    def build():
+        import boto3
+        return boto3.client('sqs')
+    return _shared('sqs', build)
+
+
+def twilio(pool_size=8):
+    """Twilio REST client over a keep-alive connection pool"""
+    def build():
+        from twilio.rest import Client
+        from phishnet.twilio_http import PooledTwilioHttpClient
+        return Client(os.getenv('ACCOUNT_SID'), os.getenv('AUTH_TOKEN'),
+                      http_client=PooledTwilioHttpClient(pool_size=pool_size))
+    return _shared('twilio', build)
@@ -0,0 +1,87 @@
+"""Random forest inference on flat NumPy arrays, without scikit-learn.
+
+flatten() turns a fitted RandomForestClassifier into a handful of arrays,
+with all trees' nodes laid end to end. FlatForest walks every tree for a
+whole batch at once: one gather per tree level instead of scikit-learn's
+per-call validation and per-tree dispatch. It needs only NumPy, so the
+detector doesn't import scikit-learn at all.
+
+Predictions match the original model exactly. Features are compared as
+float32 against the trees' float64 thresholds, as scikit-learn does, and
+per-tree probabilities are added in estimator order before averaging.
+"""
+import numpy as np
+
+
+def flatten(model):
+    """Arrays describing a fitted RandomForestClassifier (or any list of fitted trees in estimators_)"""
+    features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+    offset = 0
+    for estimator in model.estimators_:
+        tree = estimator.tree_
+        nodes = np.arange(tree.node_count)
+        leaf = tree.children_left < 0
+        # Leaves point back at themselves, so walking past the bottom of a tree is a no-op
+        features.append(np.where(leaf, 0, tree.feature))
+        thresholds.append(tree.threshold)
+        lefts.append(np.where(leaf, nodes, tree.children_left) + offset)
+        rights.append(np.where(leaf, nodes, tree.children_right) + offset)
+        # Normalised the same way DecisionTreeClassifier.predict_proba does
+        value = tree.value[:, 0, :]
+        normalizer = value.sum(axis=1)[:, None]
+        normalizer[normalizer == 0.0] = 1.0
+        values.append(value / normalizer)
+        roots.append(offset)
+        offset += tree.node_count
+
+    return {
+        "feature": np.concatenate(features).astype(np.int32),
+        "threshold": np.concatenate(thresholds).astype(np.float64),
+        "left": np.concatenate(lefts).astype(np.int32),
+        "right": np.concatenate(rights).astype(np.int32),
+        "value": np.concatenate(values).astype(np.float64),
+        "roots": np.array(roots, dtype=np.int32),
+        "classes": np.asarray(model.classes_),
+    }
+
+
+class FlatForest:
+    """Batch inference over the arrays from flatten()"""
+
+    def __init__(self, arrays):
+        self.feature = arrays["feature"]
+        self.threshold = arrays["threshold"]
+        self.left = arrays["left"]
+        self.right = arrays["right"]
+        self.value = arrays["value"]
+        self.roots = arrays["roots"]
+        self.classes_ = arrays["classes"]
+        self.is_leaf = self.left == np.arange(len(self.left))
+
+    def leaves(self, X):
+        """Leaf node index of every (row, tree)"""
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        n_rows, n_features = X.shape
+        n_trees = len(self.roots)
+        values = X.ravel()
+        # One entry per (row, tree), row-major; only paths still above a leaf are advanced
+        node = np.tile(self.roots, n_rows)
+        offset = np.repeat(np.arange(n_rows) * n_features, n_trees)
+        active = np.flatnonzero(~self.is_leaf[node])
+        while active.size:
+            current = node[active]
+            go_left = values[offset[active] + self.feature[current]] <= self.threshold[current]
+            current = np.where(go_left, self.left[current], self.right[current])
+            node[active] = current
+            active = active[~self.is_leaf[current]]
+        return node.reshape(n_rows, n_trees)
+
+    def predict_proba(self, X):
+        node = self.leaves(X)
+        proba = np.zeros((node.shape[0], self.value.shape[1]))
+        for tree in range(node.shape[1]):
+            proba += self.value[node[:, tree]]
+        return proba / node.shape[1]
+
+    def predict(self, X):
+        return self.classes_[self.predict_proba(X).argmax(axis=1)]
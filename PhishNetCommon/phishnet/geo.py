@@ -0,0 +1,124 @@
+"""City coordinates and great-circle distances for location rules.
+
+CITY_COORDINATES covers every city the producers and FraudTester generate.
+locate() resolves a Location string to (lat, lon):
+
+    1. an exact name from the table (one dict lookup)
+    2. otherwise, the city phishnet.locations resolves it to, allowing for
+       case, accents, aliases and typos ("sao paulo", "NYC", "Tokoyo")
+    3. otherwise, for "City, ST" strings like generate_data.py's, the city
+       if it is known and lies in that state, else the centre of the state
+
+Steps 2 and 3 are cached per distinct string, so every location costs a
+dict lookup after the first time it is seen. haversine_km() works on whole
+arrays. NumPy is only imported by the array functions, so the tables can be
+used without it.
+"""
+from functools import lru_cache
+
+EARTH_RADIUS_KM = 6371.0
+
+CITY_COORDINATES = {
+    # United States
+    "New York": (40.7128, -74.0060), "Los Angeles": (34.0522, -118.2437), "Chicago": (41.8781, -87.6298),
+    "Miami": (25.7617, -80.1918), "San Francisco": (37.7749, -122.4194), "Boston": (42.3601, -71.0589),
+    "Atlanta": (33.7490, -84.3880), "Dallas": (32.7767, -96.7970), "Houston": (29.7604, -95.3698),
+    "Seattle": (47.6062, -122.3321), "Philadelphia": (39.9526, -75.1652), "Phoenix": (33.4484, -112.0740),
+    "San Diego": (32.7157, -117.1611), "Denver": (39.7392, -104.9903), "Austin": (30.2672, -97.7431),
+    "Orlando": (28.5383, -81.3792), "Las Vegas": (36.1699, -115.1398), "Charlotte": (35.2271, -80.8431),
+    "Detroit": (42.3314, -83.0458), "Minneapolis": (44.9778, -93.2650), "Tampa": (27.9506, -82.4572),
+    "Portland": (45.5152, -122.6784), "Columbus": (39.9612, -82.9988), "Indianapolis": (39.7684, -86.1581),
+    "Nashville": (36.1627, -86.7816), "Cleveland": (41.4993, -81.6944), "Kansas City": (39.0997, -94.5786),
+    "Milwaukee": (43.0389, -87.9065), "Raleigh": (35.7796, -78.6382), "Pittsburgh": (40.4406, -79.9959),
+    "Cincinnati": (39.1031, -84.5120), "Salt Lake City": (40.7608, -111.8910), "St. Louis": (38.6270, -90.1994),
+    "San Antonio": (29.4241, -98.4936), "Sacramento": (38.5816, -121.4944), "Baltimore": (39.2904, -76.6122),
+    "New Orleans": (29.9511, -90.0715), "Omaha": (41.2565, -95.9345), "Oklahoma City": (35.4676, -97.5164),
+    "Louisville": (38.2527, -85.7585), "Richmond": (37.5407, -77.4360),
+    # Americas
+    "Toronto": (43.6532, -79.3832), "Vancouver": (49.2827, -123.1207), "Montreal": (45.5017, -73.5673),
+    "Mexico City": (19.4326, -99.1332), "São Paulo": (-23.5505, -46.6333), "Buenos Aires": (-34.6037, -58.3816),
+    # Europe
+    "London": (51.5074, -0.1278), "Paris": (48.8566, 2.3522), "Berlin": (52.5200, 13.4050),
+    "Amsterdam": (52.3676, 4.9041), "Madrid": (40.4168, -3.7038), "Rome": (41.9028, 12.4964),
+    "Barcelona": (41.3851, 2.1734), "Copenhagen": (55.6761, 12.5683), "Stockholm": (59.3293, 18.0686),
+    "Oslo": (59.9139, 10.7522), "Helsinki": (60.1699, 24.9384), "Zurich": (47.3769, 8.5417),
+    "Vienna": (48.2082, 16.3738), "Moscow": (55.7558, 37.6173), "Istanbul": (41.0082, 28.9784),
+    # Asia and the Middle East
+    "Dubai": (25.2048, 55.2708), "Tokyo": (35.6762, 139.6503), "Bangkok": (13.7563, 100.5018),
+    "Singapore": (1.3521, 103.8198), "Hong Kong": (22.3193, 114.1694), "Seoul": (37.5665, 126.9780),
+    "Kuala Lumpur": (3.1390, 101.6869), "Jakarta": (-6.2088, 106.8456), "Beijing": (39.9042, 116.4074),
+    "Shanghai": (31.2304, 121.4737), "Mumbai": (19.0760, 72.8777), "New Delhi": (28.6139, 77.2090),
+    # Africa and Oceania
+    "Cape Town": (-33.9249, 18.4241), "Johannesburg": (-26.2041, 28.0473), "Lagos": (6.5244, 3.3792),
+    "Sydney": (-33.8688, 151.2093), "Melbourne": (-37.8136, 144.9631), "Brisbane": (-27.4698, 153.0251),
+    "Auckland": (-36.8485, 174.7633), "Wellington": (-41.2865, 174.7762),
+}
+
+# Approximate geographic centres, for "City, ST" locations whose city isn't in the table
+US_STATE_COORDINATES = {
+    "AL": (32.8, -86.8), "AK": (64.7, -152.3), "AZ": (34.3, -111.7), "AR": (34.9, -92.4),
+    "CA": (37.2, -119.5), "CO": (39.0, -105.5), "CT": (41.6, -72.7), "DE": (39.0, -75.5),
+    "DC": (38.9, -77.0), "FL": (28.6, -82.4), "GA": (32.7, -83.4), "HI": (20.3, -156.4),
+    "ID": (44.4, -114.6), "IL": (40.0, -89.2), "IN": (39.9, -86.3), "IA": (42.1, -93.5),
+    "KS": (38.5, -98.4), "KY": (37.5, -85.3), "LA": (31.1, -92.0), "ME": (45.4, -69.2),
+    "MD": (39.0, -76.8), "MA": (42.3, -71.8), "MI": (44.3, -85.4), "MN": (46.3, -94.3),
+    "MS": (32.7, -89.7), "MO": (38.4, -92.5), "MT": (47.0, -109.6), "NE": (41.5, -99.8),
+    "NV": (39.3, -116.6), "NH": (43.7, -71.6), "NJ": (40.2, -74.7), "NM": (34.4, -106.1),
+    "NY": (42.9, -75.5), "NC": (35.6, -79.4), "ND": (47.5, -100.5), "OH": (40.3, -82.8),
+    "OK": (35.6, -97.5), "OR": (43.9, -120.6), "PA": (40.9, -77.8), "RI": (41.7, -71.6),
+    "SC": (33.9, -80.9), "SD": (44.4, -100.2), "TN": (35.9, -86.4), "TX": (31.5, -99.3),
+    "UT": (39.3, -111.7), "VT": (44.1, -72.7), "VA": (37.5, -78.9), "WA": (47.4, -120.5),
+    "WV": (38.6, -80.6), "WI": (44.6, -89.9), "WY": (43.0, -107.6),
+}
+
+# A known city this far from a state's centre is a namesake ("Paris, TX")
+STATE_RADIUS_KM = 1000
+
+
+def _match_city(city):
+    from phishnet import locations
+
+    name = locations.canonical_name(city)
+    return CITY_COORDINATES[name] if name else None
+
+
+@lru_cache(maxsize=65536)
+def _resolve(location):
+    """Slow path of locate(), cached per distinct string"""
+    if "," not in location:
+        return _match_city(location)
+    city, _, region = location.rpartition(",")
+    coordinates = _match_city(city)
+    state = US_STATE_COORDINATES.get(region.strip().upper())
+    if state is not None and (coordinates is None or haversine_km(*coordinates, *state) > STATE_RADIUS_KM):
+        coordinates = state
+    return coordinates
+
+
+def locate(location):
+    """(lat, lon) of a Location string, or None if it can't be placed"""
+    coordinates = CITY_COORDINATES.get(location)
+    if coordinates is not None or not isinstance(location, str) or not location:
+        return coordinates
+    return _resolve(location)
+
+
+def coordinates(locations):
+    """(lat, lon) arrays for a batch of Location strings, NaN where unknown"""
+    import numpy as np
+
+    points = np.full((len(locations), 2), np.nan)
+    for i, location in enumerate(locations):
+        point = locate(location)
+        if point is not None:
+            points[i] = point
+    return points[:, 0], points[:, 1]
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance in km between arrays of points in degrees (NaN in, NaN out)"""
+    import numpy as np
+
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(v, dtype=float)) for v in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
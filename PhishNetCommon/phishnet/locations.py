@@ -0,0 +1,140 @@
+"""Canonical location names and IDs, with typo-tolerant matching.
+
+The canonical places are the cities in phishnet.geo.CITY_COORDINATES, plus
+a few aliases ("NYC", "Bombay"). Each city's ID is its position in that
+table. Names are normalized first: case, accents and punctuation are
+dropped. A name that still doesn't match exactly is looked up in a trigram
+index built at import. Candidates sharing the most trigrams are checked by
+edit distance (a swapped pair of letters counts as one edit), so "Tokoyo",
+"Lodnon" and "Dubia" resolve to Tokyo, London and Dubai. Names of five
+letters or fewer only match through a swapped pair, since any other edit
+turns real places into listed cities ("Laos" is not Lagos, "Parks" is not
+Paris). A name that is equally close to two cities matches neither.
+
+Every distinct string is resolved once and cached. After that, location_id()
+is a dict lookup, and comparing two locations is an integer compare. Strings
+that match no city still get a stable ID within the process (from their
+normalized form), so "Reykjavik" and "reykjavik " compare equal too.
+"""
+import unicodedata
+from collections import Counter
+from functools import lru_cache
+
+from phishnet.geo import CITY_COORDINATES
+
+CANONICAL_NAMES = list(CITY_COORDINATES)
+
+ALIASES = {
+    "nyc": "New York", "new york city": "New York", "la": "Los Angeles", "sf": "San Francisco",
+    "saint louis": "St. Louis", "vegas": "Las Vegas", "philly": "Philadelphia",
+    "delhi": "New Delhi", "bombay": "Mumbai", "tokio": "Tokyo", "peking": "Beijing", "mexico df": "Mexico City",
+}
+
+# Candidates sharing the most trigrams with a query that are checked by edit distance
+CANDIDATES = 5
+# Names this short only match a city with two neighbouring letters swapped
+SHORT_NAME = 5
+# IDs for strings that aren't a known city start here
+UNMATCHED_BASE = 1 << 32
+
+
+def normalize(name):
+    """Lower case, no accents, punctuation or extra spaces: "São Paulo" -> "sao paulo" """
+    text = unicodedata.normalize("NFKD", name).encode("ascii", "ignore").decode()
+    text = "".join(c if c.isalnum() else " " for c in text.lower())
+    return " ".join(text.split())
+
+
+def trigrams(key):
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def edit_distance(a, b, limit):
+    """Edit distance between a and b counting a swap of neighbouring letters as
+    one edit, or limit + 1 once it is certain to exceed limit"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    before, previous = None, list(range(len(b) + 1))
+    for i, ca in enumerate(a, start=1):
+        current = [i]
+        for j, cb in enumerate(b, start=1):
+            cost = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb))
+            if i > 1 and j > 1 and ca == b[j - 2] and a[i - 2] == cb:
+                cost = min(cost, before[j - 2] + 1)
+            current.append(cost)
+        if min(current) > limit:
+            return limit + 1
+        before, previous = previous, current
+    return previous[-1]
+
+
+def max_edits(key):
+    return 1 if len(key) < 10 else 2
+
+
+def _is_swap(key, candidate):
+    """True if candidate is key with two neighbouring letters swapped"""
+    differences = [i for i, (a, b) in enumerate(zip(key, candidate)) if a != b]
+    return (len(key) == len(candidate) and len(differences) == 2 and differences[1] == differences[0] + 1
+            and key[differences[0]] == candidate[differences[1]] and key[differences[1]] == candidate[differences[0]])
+
+
+# Normalized key -> canonical ID, and trigram -> keys containing it
+_IDS = {normalize(name): i for i, name in enumerate(CANONICAL_NAMES)}
+_IDS.update({alias: CANONICAL_NAMES.index(name) for alias, name in ALIASES.items()})
+_KEYS = list(_IDS)
+_POSTINGS = {}
+for _k, _key in enumerate(_KEYS):
+    for _gram in trigrams(_key):
+        _POSTINGS.setdefault(_gram, []).append(_k)
+
+
+def _fuzzy_id(key):
+    """Canonical ID of the one closest indexed key within max_edits(key), else None"""
+    shared = Counter()
+    for gram in trigrams(key):
+        shared.update(_POSTINGS.get(gram, ()))
+    limit = max_edits(key)
+    best_distance, best_ids = limit + 1, set()
+    for k, _ in shared.most_common(CANDIDATES):
+        candidate = _KEYS[k]
+        if len(key) <= SHORT_NAME:
+            distance = 1 if _is_swap(key, candidate) else limit + 1
+        else:
+            distance = edit_distance(key, candidate, limit)
+        if distance < best_distance:
+            best_distance, best_ids = distance, {_IDS[candidate]}
+        elif distance == best_distance <= limit:
+            best_ids.add(_IDS[candidate])
+    return best_ids.pop() if len(best_ids) == 1 else None
+
+
+@lru_cache(maxsize=65536)
+def _resolve(location):
+    key = normalize(location)
+    canonical = _IDS.get(key)
+    if canonical is None and key:
+        canonical = _fuzzy_id(key)
+    if canonical is None:
+        return UNMATCHED_BASE + (hash(key) & 0xFFFFFFFF), False
+    return canonical, True
+
+
+def location_id(location):
+    """Integer ID of a location string; equal IDs mean the same place"""
+    if not isinstance(location, str):
+        location = "" if location is None else str(location)
+    return _resolve(location)[0]
+
+
+def canonical_name(location):
+    """The canonical city name for a location string, or None if it matches no city"""
+    if not isinstance(location, str):
+        return None
+    canonical, matched = _resolve(location)
+    return CANONICAL_NAMES[canonical] if matched else None
+
+
+def location_ids(locations):
+    return [location_id(location) for location in locations]
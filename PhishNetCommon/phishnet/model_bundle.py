@@ -0,0 +1,129 @@
+"""The fraud model bundle: model, category codes and feature schema in one file.
+
+TrainingModel.py writes a bundle per model version and FraudDetectionLambda
+loads it through the model registry. A bundle is a plain dict of NumPy
+arrays and plain values saved with joblib, uncompressed, so every array in
+it can be memory-mapped on load instead of copied, and loading it never
+imports scikit-learn:
+
+    format        BUNDLE_FORMAT the bundle was written with
+    version       model version, e.g. "v0003"
+    schema        feature order, categorical columns and the unknown code
+    schema_hash   hash of the schema, checked against this module's on load
+    categories    column -> array of category values, indexed by code
+    forest        the random forest flattened into arrays (see phishnet.forest)
+    metadata      training manifest (sources, row counts, metrics)
+
+Category codes start at 1. Code 0 (UNKNOWN_CODE) is reserved for values the
+model has never seen, so new merchants or locations still get scored.
+FeatureEncoder turns transactions into model input with plain dict lookups.
+"""
+import hashlib
+import json
+
+BUNDLE_FILE = "fraud_bundle.joblib"
+BUNDLE_FORMAT = 2
+
+FEATURES = ["Amount", "Merchant", "Category", "PaymentMethod", "Location"]
+CATEGORICAL_FEATURES = ["Merchant", "Category", "PaymentMethod", "Location"]
+UNKNOWN_CODE = 0
+
+
+class BundleError(Exception):
+    """The bundle can't be used with this code (wrong format or feature schema)"""
+
+
+def schema():
+    return {"features": FEATURES, "categorical": CATEGORICAL_FEATURES, "unknown_code": UNKNOWN_CODE}
+
+
+def schema_hash(feature_schema=None):
+    """Short stable hash of a feature schema; changes whenever features or their encoding do"""
+    encoded = json.dumps(feature_schema or schema(), sort_keys=True).encode()
+    return hashlib.sha256(encoded).hexdigest()[:16]
+
+
+def build(forest_arrays, mappings, version, metadata=None):
+    """Bundle a flattened forest with its value -> code mappings (codes from 1, 0 = unknown)"""
+    import numpy as np
+
+    categories = {}
+    for column in CATEGORICAL_FEATURES:
+        mapping = mappings.get(column, {})
+        values = [""] * (len(mapping) + 1)
+        for value, code in mapping.items():
+            values[code] = value
+        categories[column] = np.array(values, dtype=str)
+    return {
+        "format": BUNDLE_FORMAT,
+        "version": version,
+        "schema": schema(),
+        "schema_hash": schema_hash(),
+        "categories": categories,
+        "forest": forest_arrays,
+        "metadata": metadata or {},
+    }
+
+
+def save(bundle, path):
+    import joblib
+    # No compression: compressed arrays can't be memory-mapped
+    joblib.dump(bundle, path)
+
+
+def load(path, mmap_mode="r"):
+    """Load and check a bundle. Raises BundleError if it doesn't match this schema"""
+    import joblib
+    bundle = joblib.load(path, mmap_mode=mmap_mode)
+    if not isinstance(bundle, dict) or bundle.get("format") != BUNDLE_FORMAT:
+        raise BundleError(f"{path} is not a format {BUNDLE_FORMAT} model bundle")
+    if bundle.get("schema_hash") != schema_hash():
+        raise BundleError(f"{path} was trained on feature schema {bundle.get('schema_hash')}, "
+                          f"this code expects {schema_hash()}")
+    return bundle
+
+
+def mappings(bundle):
+    """column -> {value: code} lookup dicts built from the bundle's category tables"""
+    return {
+        column: {value: code for code, value in enumerate(values.tolist()) if code != UNKNOWN_CODE}
+        for column, values in bundle["categories"].items()
+    }
+
+
+class FeatureEncoder:
+    """Encodes transactions into contiguous float32 feature rows, in FEATURES order.
+
+    Built once per bundle load. Each categorical column is a plain dict
+    lookup, with no per-call array construction or validation like
+    LabelEncoder.transform. float32 is also the dtype scikit-learn's trees
+    compare in, so encoding at that width loses nothing.
+    """
+
+    def __init__(self, column_mappings):
+        self.lookups = [(column, column_mappings.get(column, {})) for column in CATEGORICAL_FEATURES]
+
+    def encode(self, transactions):
+        import numpy as np
+
+        rows = np.empty((len(transactions), len(FEATURES)), dtype=np.float32)
+        rows[:, 0] = [float(t["Amount"]) for t in transactions]
+        for j, (column, lookup) in enumerate(self.lookups, start=1):
+            get = lookup.get
+            rows[:, j] = [get(t.get(column), UNKNOWN_CODE) for t in transactions]
+        return rows
+
+    def encode_columns(self, columns):
+        """Same rows as encode(), from a dict of equal-length column arrays"""
+        import numpy as np
+
+        rows = np.empty((len(columns["Amount"]), len(FEATURES)), dtype=np.float32)
+        rows[:, 0] = np.asarray(columns["Amount"], dtype=float)
+        for j, (column, lookup) in enumerate(self.lookups, start=1):
+            get = lookup.get
+            values = columns.get(column)
+            rows[:, j] = UNKNOWN_CODE if values is None else [get(v, UNKNOWN_CODE) for v in np.asarray(values).tolist()]
+        return rows
+
+    def encode_one(self, transaction):
+        return self.encode([transaction])[0]
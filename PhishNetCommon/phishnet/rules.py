@@ -0,0 +1,170 @@
+"""Fraud scoring rules, loaded from a JSON file shared by every Lambda.
+
+rules.json (next to this module, or the file named by PHISHNET_RULES) holds
+every number the rule-based score uses: the alert threshold, merchant risk
+weights, amount tiers, high-risk locations, and the behavior, impossible
+travel and velocity rules. RuleSet compiles it once per load into lookup
+structures: frozensets and dicts for names, and sorted tables for
+threshold tiers. The scoring helpers work on whole batches with NumPy, which
+is only imported when they are first used, so the producer can look up
+merchant weights without it.
+
+The registry re-checks the file's mtime at most every PHISHNET_RULES_RELOAD
+seconds (default 30) and recompiles it when it changes. A file that fails
+to compile is reported and the previous rules stay in force.
+"""
+import bisect
+import json
+import os
+import threading
+import time
+
+RULES_PATH = os.getenv('PHISHNET_RULES', os.path.join(os.path.dirname(os.path.abspath(__file__)), "rules.json"))
+RELOAD_SECONDS = float(os.getenv('PHISHNET_RULES_RELOAD', '30'))
+
+VELOCITY_SUBJECTS = ("user", "merchant")
+VELOCITY_MEASURES = ("count", "amount")
+# The windows the detector keeps UserFeatures buckets for
+BEHAVIOR_WINDOWS = ("1h", "24h", "30d")
+
+
+class RulesError(Exception):
+    """The rules file is missing a setting or has an invalid one"""
+
+
+def _number(section, key, name, integer=False, positive=False):
+    """section[key], which the rules file must give as a number"""
+    if key not in section:
+        raise RulesError(f"{name} is missing {key}")
+    value = section[key]
+    kind = int if integer else (int, float)
+    if isinstance(value, bool) or not isinstance(value, kind) or (positive and value <= 0):
+        raise RulesError(f"{name}: {key} must be a {'positive ' if positive else ''}"
+                         f"{'whole number' if integer else 'number'}, not {value!r}")
+    return value
+
+
+class RuleSet:
+    """A compiled rules file"""
+
+    def __init__(self, config):
+        try:
+            self.fraud_threshold = float(config["fraud_threshold"])
+
+            merchant_risk = config["merchant_risk"]
+            self.merchant_weights = {name: float(weight) for name, weight in merchant_risk["weights"].items()}
+            self.default_merchant_weight = float(merchant_risk["default"])
+
+            # Tier i applies above bounds[i]; searchsorted counts the bounds an amount is over
+            tiers = sorted(config["amount_tiers"], key=lambda tier: tier["above"])
+            self.amount_bounds = [float(tier["above"]) for tier in tiers]
+            self.amount_table = [0.0] + [float(tier["score"]) for tier in tiers]
+
+            self.high_risk_locations = frozenset(config["location"]["high_risk"])
+            self.location_score = float(config["location"]["score"])
+
+            self.behavior = dict(config["behavior"])
+            if self.behavior.get("window") not in BEHAVIOR_WINDOWS:
+                raise RulesError(f"behavior needs a window in {BEHAVIOR_WINDOWS}")
+            for key in ("min_history", "zscore_limit", "score"):
+                _number(self.behavior, key, "behavior")
+
+            self.impossible_travel = dict(config["impossible_travel"])
+            for key in ("max_speed_kmh", "min_distance_km", "score"):
+                _number(self.impossible_travel, key, "impossible_travel")
+
+            self.velocity_rules = [dict(rule) for rule in config["velocity"]]
+            for rule in self.velocity_rules:
+                name = f"Velocity rule {rule.get('name')}"
+                if not isinstance(rule.get("name"), str):
+                    raise RulesError(f"{name} needs a name")
+                if rule.get("subject") not in VELOCITY_SUBJECTS or rule.get("measure") not in VELOCITY_MEASURES:
+                    raise RulesError(f"{name} needs a subject in {VELOCITY_SUBJECTS} "
+                                     f"and a measure in {VELOCITY_MEASURES}")
+                _number(rule, "limit", name)
+                _number(rule, "score", name)
+                # Whole seconds: both end up in the counter IDs
+                window = _number(rule, "window", name, integer=True, positive=True)
+                if window % _number(rule, "bucket", name, integer=True, positive=True):
+                    raise RulesError(f"{name}: window must be a multiple of bucket")
+        except (KeyError, TypeError, ValueError) as e:
+            raise RulesError(f"Invalid rules: {e!r}")
+
+    @classmethod
+    def from_file(cls, path):
+        try:
+            with open(path) as f:
+                config = json.load(f)
+        except (OSError, ValueError) as e:
+            raise RulesError(f"Could not read rules from {path}: {e}")
+        return cls(config)
+
+    def merchant_weight(self, merchant):
+        return self.merchant_weights.get(merchant, self.default_merchant_weight)
+
+    def amount_score(self, amount):
+        return self.amount_table[bisect.bisect_left(self.amount_bounds, float(amount))]
+
+    def location_risk(self, location):
+        return self.location_score if location in self.high_risk_locations else 0.0
+
+    def merchant_risks(self, merchants):
+        """Merchant risk weights for a batch of merchant names"""
+        import numpy as np
+
+        get, default = self.merchant_weights.get, self.default_merchant_weight
+        return np.fromiter((get(merchant, default) for merchant in merchants), dtype=float, count=len(merchants))
+
+    def amount_scores(self, amounts):
+        """Score of the highest amount tier each amount is over"""
+        import numpy as np
+
+        amounts = np.asarray(amounts, dtype=float)
+        return np.asarray(self.amount_table)[np.searchsorted(self.amount_bounds, amounts, side="left")]
+
+    def location_scores(self, locations, trusted):
+        """High-risk location score, except where `trusted` (a boolean array) is set"""
+        import numpy as np
+
+        high_risk = self.high_risk_locations
+        risky = np.fromiter((location in high_risk for location in locations), dtype=bool, count=len(locations))
+        return np.where(risky & ~np.asarray(trusted, dtype=bool), self.location_score, 0.0)
+
+
+class RuleRegistry:
+    """Keeps the compiled rules warm and reloads them when the file changes"""
+
+    def __init__(self, path=RULES_PATH, reload_seconds=RELOAD_SECONDS):
+        self.path = path
+        self.reload_seconds = reload_seconds
+        self._lock = threading.Lock()
+        self._rules = None
+        self._mtime = None
+        self._checked_at = 0.0
+
+    def get(self):
+        """The current RuleSet. Raises RulesError only if no rules have ever loaded"""
+        now = time.monotonic()
+        if self._rules is not None and now - self._checked_at < self.reload_seconds:
+            return self._rules
+        with self._lock:
+            self._checked_at = now
+            try:
+                mtime = os.stat(self.path).st_mtime_ns
+            except OSError:
+                mtime = None
+            if self._rules is not None and mtime == self._mtime:
+                return self._rules
+            try:
+                self._rules = RuleSet.from_file(self.path)
+                self._mtime = mtime
+                print(f"Loaded fraud rules from {self.path}")
+            except RulesError as e:
+                if self._rules is None:
+                    raise
+                print(f"Error reloading fraud rules, keeping the previous ones: {e}")
+            return self._rules
+
+
+# Shared per-container registry
+registry = RuleRegistry()
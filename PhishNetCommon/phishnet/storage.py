@@ -0,0 +1,620 @@
+"""Storage backends for the PhishNet tables.
+
+Every Lambda talks to its tables through the boto3 DynamoDB resource API
+(`resource().Table(name)`, `resource().batch_get_item(...)`). This module
+hands out either the real DynamoDB resource or an in-process stand-in with
+the same methods and expression semantics, selected with PHISHNET_STORAGE:
+
+    PHISHNET_STORAGE=dynamodb   (default) boto3.resource('dynamodb')
+    PHISHNET_STORAGE=memory     MemoryResource, shared by the whole process
+
+The in-memory backend supports the subset of DynamoDB the project uses:
+get/put/update/delete/query/scan, batch_get_item, batch_writer, condition,
+update, key condition and projection expressions on top-level attributes.
+It keeps per-operation call counts so benchmarks can report them.
+"""
+import copy
+import os
+import re
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from decimal import Decimal
+
+# Key schema of every table the Lambdas use: table -> (partition key, sort key)
+TABLE_KEYS = {
+    "Transactions": ("TransactionID", None),
+    "Users": ("User_ID", None),
+    "UserFraudTransactionsMap": ("PhoneNumber", "TransactionID"),
+    "UserFeatures": ("User_ID", None),
+    "VelocityCounters": ("CounterID", None),
+    "TestTransactions": ("TransactionID", None),
+    "TestResults": ("TestID", None),
+}
+
+_lock = threading.Lock()
+_resource = None
+
+
+def backend_name():
+    return os.getenv('PHISHNET_STORAGE', 'dynamodb').lower()
+
+
+def resource(fresh=False):
+    """The DynamoDB-compatible resource for the configured backend.
+
+    The resource is created once per process. With fresh=True a new DynamoDB
+    resource is returned instead, for use from another thread (boto3
+    resources are not thread safe); the in-memory backend is always shared.
+    """
+    global _resource
+    if backend_name() == 'memory':
+        with _lock:
+            if not isinstance(_resource, MemoryResource):
+                _resource = MemoryResource()
+            return _resource
+
+    import boto3
+    if fresh:
+        return boto3.session.Session().resource('dynamodb')
+    with _lock:
+        if _resource is None or isinstance(_resource, MemoryResource):
+            _resource = boto3.resource('dynamodb')
+        return _resource
+
+
+def table(name, fresh=False):
+    return resource(fresh).Table(name)
+
+
+def reset():
+    """Forget the current resource (and all in-memory data)"""
+    global _resource
+    with _lock:
+        _resource = None
+
+
+def is_conditional_check_failure(error):
+    """True for a failed ConditionExpression, from either backend"""
+    response = getattr(error, 'response', None) or {}
+    return response.get('Error', {}).get('Code') == 'ConditionalCheckFailedException'
+
+
+class StorageError(Exception):
+    """Raised by the in-memory backend, shaped like a botocore ClientError"""
+
+    def __init__(self, code, message):
+        super().__init__(f"An error occurred ({code}): {message}")
+        self.response = {"Error": {"Code": code, "Message": message}}
+
+
+class ConditionalCheckFailed(StorageError):
+    def __init__(self):
+        super().__init__("ConditionalCheckFailedException", "The conditional request failed")
+
+
+class ValidationError(StorageError):
+    def __init__(self, message):
+        super().__init__("ValidationException", message)
+
+
+class MemoryResource:
+    """In-process stand-in for boto3.resource('dynamodb')"""
+
+    def __init__(self, table_keys=None):
+        self.table_keys = dict(TABLE_KEYS, **(table_keys or {}))
+        self.tables = {}
+        self.calls = Counter()
+        self._lock = threading.RLock()
+
+    def Table(self, name):
+        with self._lock:
+            if name not in self.tables:
+                if name not in self.table_keys:
+                    raise StorageError("ResourceNotFoundException", f"Requested resource not found: {name}")
+                self.tables[name] = MemoryTable(self, name, *self.table_keys[name])
+            return self.tables[name]
+
+    def create_table(self, name, partition_key, sort_key=None):
+        with self._lock:
+            self.table_keys[name] = (partition_key, sort_key)
+            return self.Table(name)
+
+    def batch_get_item(self, RequestItems):
+        self.calls["batch_get_item"] += 1
+        if sum(len(request["Keys"]) for request in RequestItems.values()) > 100:
+            raise ValidationError("Too many items requested for the BatchGetItem call")
+        responses = {}
+        for name, request in RequestItems.items():
+            table = self.Table(name)
+            projection = _projection(request.get("ProjectionExpression"), request.get("ExpressionAttributeNames"))
+            items = []
+            for key in request["Keys"]:
+                item = table._get(key)
+                if item is not None:
+                    items.append(_project(item, projection))
+            responses[name] = items
+        return {"Responses": responses, "UnprocessedKeys": {}}
+
+    def reset_stats(self):
+        self.calls.clear()
+
+
+class MemoryTable:
+    """One in-memory table with the boto3 Table methods the Lambdas call"""
+
+    def __init__(self, owner, name, partition_key, sort_key=None):
+        self.owner = owner
+        self.name = name
+        self.partition_key = partition_key
+        self.sort_key = sort_key
+        self.items = {}
+
+    # Reads
+
+    def get_item(self, Key, ProjectionExpression=None, ExpressionAttributeNames=None, ConsistentRead=False):
+        self._count("get_item")
+        item = self._get(Key)
+        if item is None:
+            return {}
+        return {"Item": _project(item, _projection(ProjectionExpression, ExpressionAttributeNames))}
+
+    def query(self, KeyConditionExpression, ExpressionAttributeNames=None, ExpressionAttributeValues=None,
+              FilterExpression=None, ProjectionExpression=None, ScanIndexForward=True, Limit=None,
+              ExclusiveStartKey=None, **kwargs):
+        self._count("query")
+        key_condition, names, values = _condition_args(
+            KeyConditionExpression, ExpressionAttributeNames, ExpressionAttributeValues, is_key_condition=True)
+        filter_condition = None
+        if FilterExpression is not None:
+            filter_condition, names, values = _condition_args(FilterExpression, names, values)
+        key_matches = Expression(key_condition, names, values).condition()
+        filter_matches = Expression(filter_condition, names, values).condition() if filter_condition else None
+
+        with self.owner._lock:
+            items = [item for item in self.items.values() if key_matches(item)]
+        if self.sort_key:
+            items.sort(key=lambda item: item.get(self.sort_key), reverse=not ScanIndexForward)
+        return self._page(items, filter_matches, ProjectionExpression, names, Limit, ExclusiveStartKey)
+
+    def scan(self, ProjectionExpression=None, ExpressionAttributeNames=None, ExpressionAttributeValues=None,
+             FilterExpression=None, Limit=None, ExclusiveStartKey=None, Segment=None, TotalSegments=None, **kwargs):
+        self._count("scan")
+        names, values = ExpressionAttributeNames, ExpressionAttributeValues
+        filter_matches = None
+        if FilterExpression is not None:
+            filter_condition, names, values = _condition_args(FilterExpression, names, values)
+            filter_matches = Expression(filter_condition, names, values).condition()
+
+        with self.owner._lock:
+            items = list(self.items.values())
+        if TotalSegments:
+            items = [item for item in items
+                     if hash(str(item[self.partition_key])) % TotalSegments == Segment]
+        return self._page(items, filter_matches, ProjectionExpression, names, Limit, ExclusiveStartKey)
+
+    # Writes
+
+    def put_item(self, Item, ConditionExpression=None, ExpressionAttributeNames=None,
+                 ExpressionAttributeValues=None, **kwargs):
+        self._count("put_item")
+        item = _to_storage(Item)
+        key = self._key(item)
+        with self.owner._lock:
+            self._check(self.items.get(key), ConditionExpression, ExpressionAttributeNames, ExpressionAttributeValues)
+            self.items[key] = item
+        return {}
+
+    def update_item(self, Key, UpdateExpression, ConditionExpression=None, ExpressionAttributeNames=None,
+                    ExpressionAttributeValues=None, ReturnValues="NONE", **kwargs):
+        self._count("update_item")
+        key = self._key(Key)
+        values = _to_storage(ExpressionAttributeValues or {})
+        with self.owner._lock:
+            old = self.items.get(key)
+            self._check(old, ConditionExpression, ExpressionAttributeNames, values)
+            new, changed = Expression(UpdateExpression, ExpressionAttributeNames, values).apply_update(
+                old or _to_storage(Key))
+            for attribute in (self.partition_key, self.sort_key):
+                if attribute and new.get(attribute) != Key.get(attribute):
+                    raise ValidationError(f"Cannot update attribute {attribute}. This attribute is part of the key")
+            self.items[key] = new
+
+        if ReturnValues == "ALL_NEW":
+            return {"Attributes": copy.deepcopy(new)}
+        if ReturnValues == "ALL_OLD":
+            return {"Attributes": copy.deepcopy(old)} if old else {}
+        if ReturnValues == "UPDATED_NEW":
+            return {"Attributes": {name: copy.deepcopy(new[name]) for name in changed if name in new}}
+        if ReturnValues == "UPDATED_OLD":
+            return {"Attributes": {name: copy.deepcopy(old[name]) for name in changed if old and name in old}}
+        return {}
+
+    def delete_item(self, Key, ConditionExpression=None, ExpressionAttributeNames=None,
+                    ExpressionAttributeValues=None, **kwargs):
+        self._count("delete_item")
+        key = self._key(Key)
+        with self.owner._lock:
+            self._check(self.items.get(key), ConditionExpression, ExpressionAttributeNames, ExpressionAttributeValues)
+            self.items.pop(key, None)
+        return {}
+
+    @contextmanager
+    def batch_writer(self, overwrite_by_pkeys=None):
+        writer = _MemoryBatchWriter(self)
+        yield writer
+        writer.flush()
+
+    # Helpers
+
+    def _count(self, operation):
+        self.owner.calls[f"{self.name}.{operation}"] += 1
+
+    def _key(self, item):
+        try:
+            key = (item[self.partition_key],)
+            if self.sort_key:
+                key += (item[self.sort_key],)
+        except KeyError as e:
+            raise ValidationError(f"Missing the key {e.args[0]} in the item")
+        return key
+
+    def _get(self, key):
+        with self.owner._lock:
+            item = self.items.get(self._key(key))
+            return copy.deepcopy(item) if item is not None else None
+
+    def _check(self, item, condition, names, values):
+        if condition is None:
+            return
+        condition, names, values = _condition_args(condition, names, values)
+        if not Expression(condition, names, _to_storage(values or {})).condition()(item or {}):
+            raise ConditionalCheckFailed()
+
+    def _page(self, items, filter_matches, projection_expression, names, limit, exclusive_start_key):
+        if exclusive_start_key:
+            start_key = self._key(exclusive_start_key)
+            keys = [self._key(item) for item in items]
+            items = items[keys.index(start_key) + 1:] if start_key in keys else []
+        last_key = None
+        if limit is not None and len(items) > limit:
+            items = items[:limit]
+            last_key = {name: items[-1][name] for name in (self.partition_key, self.sort_key) if name}
+        scanned = len(items)
+        if filter_matches is not None:
+            items = [item for item in items if filter_matches(item)]
+        projection = _projection(projection_expression, names)
+        response = {"Items": [_project(item, projection) for item in items],
+                    "Count": len(items), "ScannedCount": scanned}
+        if last_key:
+            response["LastEvaluatedKey"] = last_key
+        return response
+
+
+class _MemoryBatchWriter:
+    def __init__(self, table):
+        self.table = table
+        self.pending = []
+
+    def put_item(self, Item):
+        self.pending.append(("put", Item))
+        if len(self.pending) >= 25:
+            self.flush()
+
+    def delete_item(self, Key):
+        self.pending.append(("delete", Key))
+        if len(self.pending) >= 25:
+            self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+        self.table.owner.calls["batch_write_item"] += 1
+        with self.table.owner._lock:
+            for action, item in self.pending:
+                if action == "put":
+                    stored = _to_storage(item)
+                    self.table.items[self.table._key(stored)] = stored
+                else:
+                    self.table.items.pop(self.table._key(item), None)
+        self.pending = []
+
+
+def _to_storage(value):
+    """Copy a value the way DynamoDB would store it: ints become Decimal, floats are rejected"""
+    if isinstance(value, bool) or value is None or isinstance(value, (str, bytes, Decimal)):
+        return value
+    if isinstance(value, int):
+        return Decimal(value)
+    if isinstance(value, float):
+        raise TypeError("Float types are not supported. Use Decimal types instead.")
+    if isinstance(value, dict):
+        return {k: _to_storage(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_to_storage(v) for v in value]
+    if isinstance(value, (set, frozenset)):
+        return {_to_storage(v) for v in value}
+    raise TypeError(f"Unsupported type {type(value).__name__} for DynamoDB")
+
+
+def _condition_args(condition, names, values, is_key_condition=False):
+    """Accept either an expression string or a boto3.dynamodb.conditions object"""
+    if isinstance(condition, str):
+        return condition, names, values
+    from boto3.dynamodb.conditions import ConditionExpressionBuilder
+    built = ConditionExpressionBuilder().build_expression(condition, is_key_condition=is_key_condition)
+    return (built.condition_expression,
+            dict(names or {}, **built.attribute_name_placeholders),
+            dict(values or {}, **built.attribute_value_placeholders))
+
+
+def _projection(expression, names):
+    if not expression:
+        return None
+    names = names or {}
+    return [names.get(part.strip(), part.strip()) for part in expression.split(",")]
+
+
+def _project(item, projection):
+    if projection is None:
+        return copy.deepcopy(item)
+    return {name: copy.deepcopy(item[name]) for name in projection if name in item}
+
+
+# Expression parsing
+
+_TOKEN = re.compile(r"\s*(<>|<=|>=|[=<>(),+\-]|[#:]?[A-Za-z_][A-Za-z0-9_]*)")
+_MISSING = object()
+
+
+class Expression:
+    """Parses one condition or update expression against its name/value maps"""
+
+    def __init__(self, text, names=None, values=None):
+        self.tokens = self._tokenize(text)
+        self.pos = 0
+        self.names = names or {}
+        self.values = values or {}
+
+    @staticmethod
+    def _tokenize(text):
+        tokens = []
+        pos = 0
+        text = text.strip()
+        while pos < len(text):
+            match = _TOKEN.match(text, pos)
+            if not match:
+                raise ValidationError(f"Invalid expression near: {text[pos:]!r}")
+            tokens.append(match.group(1))
+            pos = match.end()
+        return tokens
+
+    def _peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else None
+
+    def _peek_keyword(self):
+        token = self._peek()
+        return token.upper() if token else None
+
+    def _take(self, expected=None):
+        token = self._peek()
+        if token is None or (expected and token.upper() != expected):
+            raise ValidationError(f"Invalid expression: expected {expected or 'a token'}, got {token!r}")
+        self.pos += 1
+        return token
+
+    # Conditions
+
+    def condition(self):
+        """Compile to a function item -> bool"""
+        check = self._or()
+        if self._peek() is not None:
+            raise ValidationError(f"Invalid expression: unexpected {self._peek()!r}")
+        return check
+
+    def _or(self):
+        left = self._and()
+        while self._peek_keyword() == "OR":
+            self._take()
+            right = self._and()
+            left = (lambda a, b: lambda item: a(item) or b(item))(left, right)
+        return left
+
+    def _and(self):
+        left = self._not()
+        while self._peek_keyword() == "AND":
+            self._take()
+            right = self._not()
+            left = (lambda a, b: lambda item: a(item) and b(item))(left, right)
+        return left
+
+    def _not(self):
+        if self._peek_keyword() == "NOT":
+            self._take()
+            inner = self._not()
+            return lambda item: not inner(item)
+        return self._primary()
+
+    def _primary(self):
+        if self._peek() == "(":
+            self._take("(")
+            inner = self._or()
+            self._take(")")
+            return inner
+
+        keyword = self._peek_keyword()
+        if keyword in ("ATTRIBUTE_EXISTS", "ATTRIBUTE_NOT_EXISTS", "BEGINS_WITH", "CONTAINS"):
+            self._take()
+            self._take("(")
+            path = self._path()
+            operand = None
+            if keyword in ("BEGINS_WITH", "CONTAINS"):
+                self._take(",")
+                operand = self._operand()
+            self._take(")")
+            if keyword == "ATTRIBUTE_EXISTS":
+                return lambda item: path in item
+            if keyword == "ATTRIBUTE_NOT_EXISTS":
+                return lambda item: path not in item
+            if keyword == "BEGINS_WITH":
+                return lambda item: isinstance(item.get(path), str) and item[path].startswith(operand(item))
+            return lambda item: path in item and operand(item) in item[path]
+
+        left = self._operand()
+        keyword = self._peek_keyword()
+        if keyword == "BETWEEN":
+            self._take()
+            low = self._operand()
+            self._take("AND")
+            high = self._operand()
+            return lambda item: _compare(left(item), low(item), ">=") and _compare(left(item), high(item), "<=")
+        if keyword == "IN":
+            self._take()
+            self._take("(")
+            options = [self._operand()]
+            while self._peek() == ",":
+                self._take(",")
+                options.append(self._operand())
+            self._take(")")
+            return lambda item: any(_compare(left(item), option(item), "=") for option in options)
+
+        operator = self._take()
+        if operator not in ("=", "<>", "<", "<=", ">", ">="):
+            raise ValidationError(f"Invalid comparison operator {operator!r}")
+        right = self._operand()
+        return lambda item: _compare(left(item), right(item), operator)
+
+    def _operand(self):
+        """Compile a path, value or size() to a function item -> value (or _MISSING)"""
+        token = self._peek()
+        if token is not None and token.upper() == "SIZE":
+            self._take()
+            self._take("(")
+            path = self._path()
+            self._take(")")
+            return lambda item: Decimal(len(item[path])) if path in item else _MISSING
+        if token is not None and token.startswith(":"):
+            value = self._value()
+            return lambda item: value
+        path = self._path()
+        return lambda item: item.get(path, _MISSING)
+
+    def _path(self):
+        token = self._take()
+        if token.startswith("#"):
+            if token not in self.names:
+                raise ValidationError(f"An expression attribute name used in the document path is not defined; attribute name: {token}")
+            return self.names[token]
+        if token.startswith(":") or not re.match(r"[A-Za-z_]", token):
+            raise ValidationError(f"Invalid attribute name {token!r}")
+        return token
+
+    def _value(self):
+        token = self._take()
+        if token not in self.values:
+            raise ValidationError(f"An expression attribute value used in expression is not defined; attribute value: {token}")
+        return self.values[token]
+
+    # Updates
+
+    def apply_update(self, item):
+        """Apply an update expression to a copy of item. Returns (new_item, changed_names)"""
+        actions = []
+        while self._peek() is not None:
+            clause = self._take().upper()
+            while True:
+                if clause == "SET":
+                    path = self._path()
+                    self._take("=")
+                    actions.append(("SET", path, self._set_value()))
+                elif clause == "REMOVE":
+                    actions.append(("REMOVE", self._path(), None))
+                elif clause in ("ADD", "DELETE"):
+                    path = self._path()
+                    value = self._value()
+                    actions.append((clause, path, lambda item, value=value: value))
+                else:
+                    raise ValidationError(f"Invalid UpdateExpression clause {clause!r}")
+                if self._peek() != ",":
+                    break
+                self._take(",")
+
+        # Every right-hand side sees the item as it was before the update
+        new = copy.deepcopy(item)
+        resolved = [(action, path, value(item) if value else None) for action, path, value in actions]
+        for action, path, value in resolved:
+            if action == "SET":
+                if value is _MISSING:
+                    raise ValidationError("The provided expression refers to an attribute that does not exist in the item")
+                new[path] = copy.deepcopy(value)
+            elif action == "REMOVE":
+                new.pop(path, None)
+            elif action == "ADD":
+                current = new.get(path)
+                if isinstance(value, set):
+                    new[path] = (current or set()) | value
+                elif isinstance(value, Decimal):
+                    new[path] = (current if current is not None else Decimal(0)) + value
+                else:
+                    raise ValidationError("ADD only supports numbers and sets")
+            elif action == "DELETE":
+                if isinstance(new.get(path), set):
+                    remaining = new[path] - value
+                    if remaining:
+                        new[path] = remaining
+                    else:
+                        new.pop(path)
+        return new, [path for _, path, _ in resolved]
+
+    def _set_value(self):
+        left = self._set_operand()
+        if self._peek() in ("+", "-"):
+            operator = self._take()
+            right = self._set_operand()
+
+            def arithmetic(item):
+                a, b = left(item), right(item)
+                if not isinstance(a, Decimal) or not isinstance(b, Decimal):
+                    raise ValidationError("An operand in the update expression has an incorrect data type")
+                return a + b if operator == "+" else a - b
+            return arithmetic
+        return left
+
+    def _set_operand(self):
+        keyword = self._peek_keyword()
+        if keyword == "IF_NOT_EXISTS":
+            self._take()
+            self._take("(")
+            path = self._path()
+            self._take(",")
+            default = self._set_operand()
+            self._take(")")
+            return lambda item: item[path] if path in item else default(item)
+        if keyword == "LIST_APPEND":
+            self._take()
+            self._take("(")
+            first = self._set_operand()
+            self._take(",")
+            second = self._set_operand()
+            self._take(")")
+            return lambda item: list(first(item)) + list(second(item))
+        return self._operand()
+
+
+def _compare(left, right, operator):
+    if left is _MISSING or right is _MISSING:
+        return operator == "<>"
+    if operator == "=":
+        return left == right
+    if operator == "<>":
+        return left != right
+    try:
+        if operator == "<":
+            return left < right
+        if operator == "<=":
+            return left <= right
+        if operator == ">":
+            return left > right
+        return left >= right
+    except TypeError:
+        return False
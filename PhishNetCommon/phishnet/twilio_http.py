@@ -0,0 +1,24 @@
+import os
+
+from requests.adapters import HTTPAdapter
+from twilio.http.http_client import TwilioHttpClient
+
+# Point the Twilio client at another host, e.g. a local fake API for testing
+TWILIO_API_BASE = os.getenv('TWILIO_API_BASE')
+TWILIO_DEFAULT_BASE = "https://api.twilio.com"
+
+
+class PooledTwilioHttpClient(TwilioHttpClient):
+    """Twilio HTTP client with a keep-alive pool sized for concurrent sends"""
+
+    def __init__(self, pool_size=8, api_base=TWILIO_API_BASE, **kwargs):
+        super().__init__(pool_connections=True, **kwargs)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.api_base = api_base.rstrip('/') if api_base else None
+
+    def request(self, method, url, *args, **kwargs):
+        if self.api_base and url.startswith(TWILIO_DEFAULT_BASE):
+            url = self.api_base + url[len(TWILIO_DEFAULT_BASE):]
+        return super().request(method, url, *args, **kwargs)
@@ -1,173 +1,545 @@
 import json
-import boto3
 import os
-import joblib
+import time
+import numpy as np
 from decimal import Decimal
-from twilio.rest import Client
 from datetime import datetime
+import feature_store
+import velocity
+from phishnet import clients, geo, rules, storage
+from phishnet.locations import location_id, location_ids
+from model_registry import registry
+from prefetch import prefetch_batch
+from alert_dispatcher import ALERT_WORKERS, AlertDispatcher
+from user_cache import UserProfileCache
+from write_pool import WritePool
 
-# AWS Clients
-dynamodb = boto3.resource('dynamodb')
+# AWS Clients (built on first use to keep cold starts short)
+dynamodb = clients.Lazy(storage.resource)
 
 # DynamoDB Tables
-transactions_table = dynamodb.Table("Transactions")
-users_table = dynamodb.Table("Users")
-mapping_table = dynamodb.Table("UserFraudTransactionsMap")
+transactions_table = clients.table("Transactions")
+users_table = clients.table("Users")
+mapping_table = clients.table("UserFraudTransactionsMap")
 
-# Twilio configuration
-TWILIO_ACCOUNT_SID = os.getenv('ACCOUNT_SID')
-TWILIO_AUTH_TOKEN = os.getenv('AUTH_TOKEN')
+# Feature and velocity counter updates for a batch run concurrently
+write_pool = WritePool()
+
+# Twilio configuration, the client is only built once an alert goes out
 TWILIO_FROM_NUMBER = os.getenv('TWILIO_FROM')
-twilio_client = Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
+twilio_client = clients.Lazy(lambda: clients.twilio(pool_size=ALERT_WORKERS))
+
+# A claimed alert that was never confirmed sent (the Lambda died between the
+# claim and the SMS) can be claimed again after this long. Keep it above the
+# function timeout so a running invocation never loses its claim.
+ALERT_CLAIM_LEASE_SECONDS = int(os.getenv('ALERT_CLAIM_LEASE_SECONDS', '900'))
+
+# claim_alert() outcomes
+CLAIMED = "claimed"
+ALREADY_SENT = "already sent"
+CLAIM_HELD = "held"
+
+# Scoring rules and the alert threshold come from phishnet/rules.json
+# (or PHISHNET_RULES) and are reloaded when the file changes
+rule_registry = rules.registry
+
+# Users profiles stay warm across invocations. HandleUserResponse bumps
+# ProfileVersion on every travel mode change, and a warm profile is re-read
+# before it is used to send an alert.
+user_cache = UserProfileCache(
+    max_size=int(os.getenv('USER_PROFILE_CACHE_SIZE', '10000')),
+    ttl_seconds=float(os.getenv('USER_PROFILE_CACHE_TTL', '60')),
+)
 
 def lambda_handler(event, context):
     print("STARTING LAMBDA EXECUTION")
     print("Received event from SQS:", json.dumps(event))
+    invocation_start = time.monotonic()
+
+    # ML model bundle stays warm across invocations
+    bundle = registry.get()
 
+    # Message IDs that SQS should redeliver; everything else is deleted.
+    # Only transient failures (throttling, claim and send errors) are
+    # redelivered. A malformed message fails the same way every time, so it
+    # is logged and dropped.
+    failed_message_ids = []
+
+    # Read every message in the batch first
+    records = []
+    carried_transactions = {}
     for record in event['Records']:
         print("Raw message body:", record['body'])
 
         try:
-            message = json.loads(record['body'])
+            message = json.loads(record['body'], parse_float=Decimal)
             if isinstance(message, str):
-                message = json.loads(message)
+                message = json.loads(message, parse_float=Decimal)
         except json.JSONDecodeError:
-            print("ERROR: Failed to decode JSON message:", record['body'])
-            return {"statusCode": 400, "body": "Invalid JSON"}
+            print("ERROR: Failed to decode JSON message, dropping it:", record['body'])
+            continue
 
-        transaction_id = message.get('TransactionID')
+        transaction_id = message.get('TransactionID') if isinstance(message, dict) else None
         if not transaction_id:
             print("ERROR: TransactionID is missing!")
             continue
+        records.append((record['messageId'], transaction_id))
 
-        print(f"Processing transaction: {transaction_id}")
-        txn_response = transactions_table.get_item(Key={'TransactionID': transaction_id})
+        # Fat messages carry the whole transaction, so there is nothing to read back
+        if isinstance(message.get('Transaction'), dict):
+            carried_transactions[transaction_id] = message['Transaction']
+
+    # One BatchGetItem round for ID-only transactions, one for their users
+    try:
+        transactions, users, unprocessed = prefetch_batch(
+            dynamodb, [transaction_id for _, transaction_id in records], carried_transactions, user_cache)
+    except Exception as e:
+        print(f"Error prefetching transactions and users: {e}")
+        failed_message_ids.extend(message_id for message_id, _ in records)
+        records, transactions, users, unprocessed = [], {}, {}, set()
 
-        if 'Item' not in txn_response:
+    batch = []
+    for message_id, transaction_id in records:
+        print(f"Processing transaction: {transaction_id}")
+        if transaction_id in unprocessed:
+            print(f"Transaction {transaction_id} could not be loaded (throttled), will retry.")
+            failed_message_ids.append(message_id)
+            continue
+        if transaction_id not in transactions:
             print(f"Transaction {transaction_id} not found in Transactions table.")
             continue
 
-        transaction = txn_response['Item']
-        amount = float(transaction['Amount'])
-        fraud_risk = float(transaction.get('RiskScore', 0))
-        location = transaction.get('Location', 'Unknown')
+        transaction = transactions[transaction_id]
         user_id = transaction.get('UserID', 'Unknown')
+        user_info = users.get(user_id, {})
+        if not user_info.get('Phone_Number'):
+            print(f"User {user_id} does not have a phone number. Skipping SMS.")
+            continue
+        try:
+            float(transaction['Amount'])
+        except (KeyError, TypeError, ValueError):
+            print(f"ERROR: Transaction {transaction_id} has no valid Amount, dropping it.")
+            continue
 
+        batch.append((message_id, transaction, user_info))
+
+    if batch:
         try:
-            user_response = users_table.get_item(Key={'UserID': user_id})
-            user_info = user_response.get('Item', {})
-            travel_mode = user_info.get('TravelMode', False)
-            trusted_locations = user_info.get('TrustedLocation', [])
-            user_phone = user_info.get('Phone_Number')
-            if not user_phone:
-                print(f"User {user_id} does not have a phone number. Skipping SMS.")
+            failed_message_ids.extend(score_and_alert(batch, bundle, invocation_start))
+        except Exception as e:
+            print(f"Error scoring batch: {e}")
+            failed_message_ids.extend(message_id for message_id, _, _ in batch)
+
+    registry.emit_metrics()
+    if failed_message_ids:
+        print(f"{len(failed_message_ids)} message(s) will be retried: {failed_message_ids}")
+    return {"batchItemFailures": [{"itemIdentifier": message_id} for message_id in failed_message_ids]}
+
+def score_and_alert(batch, bundle, invocation_start):
+    """Score (message_id, transaction, user_info) tuples and alert on fraud.
+
+    Returns the message IDs that should be retried because the alert could
+    not be claimed or sent.
+    """
+    transactions = [transaction for _, transaction, _ in batch]
+    users = [user_info for _, _, user_info in batch]
+    timestamps = [feature_store.transaction_time(transaction) for transaction in transactions]
+    feature_items = load_user_features(transactions)
+    # A user's earlier transactions in this batch count as their history too
+    features = feature_store.summarize_batch(transactions, feature_items, timestamps)
+    rule_set = rule_registry.get()
+    velocity_scores = velocity_risk_scores(transactions, timestamps, rule_set)
+    fraud_scores = score_batch(transactions, users, features, velocity_scores, rule_set)
+    ml_flags = predict_fraud_batch(transactions, bundle)
+
+    # Apply hybrid logic
+    flagged = ml_flags | (fraud_scores > rule_set.fraud_threshold)
+    # Scores that only stayed low because of travel mode, which may have been turned off since
+    travel_trusted = travel_trusted_batch(transactions, users, rule_set)
+
+    alerts = []
+    failed_message_ids = []
+    for i, (message_id, transaction, user_info) in enumerate(batch):
+        transaction_id = transaction['TransactionID']
+        print(f"Transaction {transaction_id} fraud score: {fraud_scores[i]}")
+        if not (flagged[i] or travel_trusted[i]):
+            continue
+
+        # A warm profile may predate a travel mode change (on or off), so check
+        # it before alerting and before trusting its travel location
+        fresh_user = refresh_warm_user(transaction.get('UserID'), user_info, invocation_start)
+        if fresh_user is not None:
+            user_info = fresh_user
+            rule_score = score_batch([transaction], [user_info], [features[i]], velocity_scores[i:i + 1], rule_set)[0]
+            rule_flag = rule_score > rule_set.fraud_threshold
+            if not (ml_flags[i] or rule_flag):
+                if flagged[i]:
+                    print(f"Transaction {transaction_id} cleared after refreshing user profile")
+                continue
+            if not flagged[i]:
+                print(f"Transaction {transaction_id} fraud score after refreshing user profile: {rule_score}")
+            if not user_info.get('Phone_Number'):
+                print(f"User {transaction.get('UserID')} does not have a phone number. Skipping SMS.")
                 continue
+        elif not flagged[i]:
+            continue
+        print(f"FRAUD DETECTED for transaction {transaction_id}")
+
+        # Only the delivery that wins Pending -> Sent to User sends the SMS
+        try:
+            claim = claim_alert(transaction_id)
         except Exception as e:
-            print(f"Error fetching user info for {user_id}: {e}")
+            print(f"Error updating transaction status: {e}")
+            failed_message_ids.append(message_id)
+            continue
+        if claim == CLAIM_HELD:
+            # Another delivery may still send it, or died: retry until the lease runs out
+            failed_message_ids.append(message_id)
             continue
+        if claim != CLAIMED:
+            continue
+
+        alert = build_fraud_alert(transaction_id, float(transaction['Amount']),
+                                  user_info['Phone_Number'], transaction)
+        alert['MessageID'] = message_id
+        alerts.append(alert)
 
-        # Rule-based scoring
-        location_risk_score = check_location_risk(location, travel_mode, trusted_locations)
-        amount_risk_score = check_amount_risk(amount)
-        fraud_score = (fraud_risk * 100) + amount_risk_score + location_risk_score
-        print(f"Transaction {transaction_id} fraud score: {fraud_score}")
-
-        # ML model prediction
-        model = joblib.load('/opt/fraud_model.pkl')
-        label_encoders = {
-            "Merchant": joblib.load('/opt/le_merchant.pkl'),
-            "Category": joblib.load('/opt/le_category.pkl'),
-            "PaymentMethod": joblib.load('/opt/le_payment.pkl'),
-            "Location": joblib.load('/opt/le_location.pkl'),
-        }
-        flagged_as_fraud = predict_fraud(transaction, model, label_encoders)
-
-        # Apply hybrid logic
-        fraud_threshold = 50
-        if fraud_score > fraud_threshold:
-            flagged_as_fraud = True
-
-        if flagged_as_fraud:
-            print(f"FRAUD DETECTED for transaction {transaction_id}")
-            update_transaction_status(transaction_id, "Sent to User")
-            send_fraud_alert(transaction_id, amount, user_id, user_phone)
-
-    return {"statusCode": 200, "body": "Processing complete"}
-
-def check_location_risk(location, travel_mode=False, trusted_locations=None):
-    high_risk_locations = ["Dubai", "Tokyo", "London"]
-    trusted_locations = trusted_locations or []
-
-    if travel_mode and location in trusted_locations:
+    # SMS for the whole batch go out concurrently
+    outcomes = send_fraud_alerts(alerts)
+    failed_message_ids.extend(outcome['MessageID'] for outcome in outcomes if not outcome['Sent'])
+
+    # Only now is a transaction added to its user's history: a message that is
+    # retried is scored again on redelivery and must not find itself there
+    retried = set(failed_message_ids)
+    done = [i for i, (message_id, _, _) in enumerate(batch) if message_id not in retried]
+    record_user_features([transactions[i] for i in done], feature_items, [timestamps[i] for i in done])
+    return failed_message_ids
+
+def travel_location_id(travel_location):
+    """Canonical ID of a user's TravelLocation; -1 (never a location's ID) if unset"""
+    if not isinstance(travel_location, str) or not travel_location.strip():
+        return -1
+    return location_id(travel_location)
+
+def check_location_risk(location, travel_mode=False, travel_location=None):
+    if travel_mode and location_id(location) == travel_location_id(travel_location):
         print(f"{location} is trusted during travel mode.")
         return 0
-    if location in high_risk_locations:
-        return 30
-    return 0
+    return rule_registry.get().location_risk(location)
 
 def check_amount_risk(amount):
-    if amount > 3000:
-        return 40
-    elif amount > 1000:
-        return 20
-    return 0
+    return rule_registry.get().amount_score(amount)
+
+def travel_trust(locations, travel_modes, travel_locations):
+    """Locations the user's travel mode trusts, as a boolean array. Locations are
+    compared by canonical ID, so travel mode set for "tokoyo" trusts Tokyo."""
+    ids = np.array(location_ids(locations), dtype=np.int64)
+    travel_ids = np.array([travel_location_id(t) for t in travel_locations], dtype=np.int64)
+    return np.array([bool(mode) for mode in travel_modes], dtype=bool) & (ids == travel_ids)
+
+def location_risk_scores(locations, travel_modes, travel_locations, rule_set):
+    """Vectorized check_location_risk over a batch"""
+    return rule_set.location_scores(locations, travel_trust(locations, travel_modes, travel_locations))
+
+def travel_trusted_batch(transactions, users, rule_set):
+    """Transactions whose location score was zeroed by their user's travel mode"""
+    locations = [t.get('Location', 'Unknown') for t in transactions]
+    trusted = travel_trust(locations, [u.get('TravelMode', False) for u in users],
+                           [u.get('TravelLocation') for u in users])
+    return trusted & (rule_set.location_scores(locations, np.zeros(len(locations), dtype=bool)) > 0)
+
+def amount_risk_scores(amounts, rule_set):
+    """Vectorized check_amount_risk over a batch"""
+    return rule_set.amount_scores(amounts)
+
+def behavior_risk_scores(amounts, history_counts, history_means, history_stds, rule_set):
+    """Amounts more than zscore_limit standard deviations above the user's
+    mean, once there are min_history transactions to compare with"""
+    behavior = rule_set.behavior
+    amounts = np.asarray(amounts, dtype=float)
+    means = np.asarray(history_means, dtype=float)
+    # A user who always spends the same amount still has some leeway
+    stds = np.maximum(np.asarray(history_stds, dtype=float), np.maximum(0.1 * means, 1.0))
+    unusual = ((np.asarray(history_counts) >= behavior["min_history"])
+               & (amounts - means > behavior["zscore_limit"] * stds))
+    return np.where(unusual, behavior["score"], 0)
+
+def impossible_travel_scores(locations, last_locations, seconds_since_last, rule_set):
+    """Transactions too far from the user's previous one to have got there in time.
+    Unknown locations and users without a previous transaction never score.
+    The distance floor allows for city and state centres being approximate."""
+    travel = rule_set.impossible_travel
+    lat, lon = geo.coordinates(locations)
+    last_lat, last_lon = geo.coordinates(last_locations)
+    distance = geo.haversine_km(lat, lon, last_lat, last_lon)
+    seconds = np.array([np.nan if s is None else abs(float(s)) for s in seconds_since_last])
+    speed = distance / (np.maximum(seconds, 1.0) / 3600)
+    impossible = (distance > travel["min_distance_km"]) & (speed > travel["max_speed_kmh"])
+    return np.where(impossible, travel["score"], 0)
+
+def rule_scores(amounts, fraud_risks, locations, travel_modes, travel_locations, history=None,
+                velocity_scores=None, rule_set=None):
+    """Rule-based fraud scores from column arrays, so offline evaluation scores
+    millions of rows with the same code. `history` holds "count", "mean" and
+    "std" arrays of each user's past amounts, plus their "last_location" and
+    "seconds_since_last"; without it the behavior and impossible travel rules
+    are off. `velocity_scores` are added as they are. Uses the current rules
+    unless `rule_set` is given."""
+    rule_set = rule_set or rule_registry.get()
+    fraud_risks = np.asarray(fraud_risks, dtype=float)
+    scores = (fraud_risks * 100) + amount_risk_scores(amounts, rule_set) + location_risk_scores(
+        locations, travel_modes, travel_locations, rule_set)
+    if history is not None:
+        scores = scores + behavior_risk_scores(amounts, history["count"], history["mean"], history["std"],
+                                               rule_set)
+        scores = scores + impossible_travel_scores(locations, history["last_location"],
+                                                   history["seconds_since_last"], rule_set)
+    if velocity_scores is not None:
+        scores = scores + np.asarray(velocity_scores, dtype=float)
+    return scores
 
-def predict_fraud(transaction, model, label_encoders):
+def score_batch(transactions, users, features=None, velocity_scores=None, rule_set=None):
+    """Rule-based fraud scores for a batch of transactions, their users and
+    (optionally) the users' feature_store summaries and velocity rule scores.
+    Transactions without a RiskScore get their merchant's weight from the rules."""
+    rule_set = rule_set or rule_registry.get()
+    history = None
+    if features is not None:
+        window = rule_set.behavior["window"]
+        history = {stat: [f[f"{stat}_{window}"] for f in features] for stat in ("count", "mean", "std")}
+        history["last_location"] = [f["last_location"] for f in features]
+        history["seconds_since_last"] = [f["seconds_since_last"] for f in features]
+    return rule_scores(
+        [float(t['Amount']) for t in transactions],
+        [float(t['RiskScore']) if 'RiskScore' in t else rule_set.merchant_weight(t.get('Merchant'))
+         for t in transactions],
+        [t.get('Location', 'Unknown') for t in transactions],
+        [u.get('TravelMode', False) for u in users],
+        [u.get('TravelLocation') for u in users],
+        history,
+        velocity_scores,
+        rule_set,
+    )
+
+def load_user_features(transactions):
+    """UserFeatures items for the batch's users, read in one call. Scoring goes
+    on without behavior features if they can't be read."""
+    try:
+        return feature_store.load(dynamodb, [t.get('UserID') for t in transactions])
+    except Exception as e:
+        print(f"Warning: could not load user features: {e}")
+        return {}
+
+def velocity_risk_scores(transactions, timestamps, rule_set):
+    """Count the batch into the velocity counters, then score it against them.
+    Transactions an earlier delivery already counted aren't counted twice.
+    Counter errors turn the velocity rules off for this batch."""
+    try:
+        velocity.record(write_pool, transactions, timestamps, rule_set.velocity_rules)
+        counters = velocity.load(dynamodb, transactions, timestamps, rule_set.velocity_rules)
+    except Exception as e:
+        print(f"Warning: could not update velocity counters: {e}")
+        return np.zeros(len(transactions))
+    return velocity.risk_scores(transactions, timestamps, counters, rule_set.velocity_rules)
+
+def record_user_features(transactions, feature_items, timestamps):
+    """Add the batch to UserFeatures, one UpdateItem per transaction. Users are
+    written concurrently, each user's transactions in time order."""
+    by_user = {}
+    for i, transaction in enumerate(transactions):
+        if transaction.get('UserID'):
+            by_user.setdefault(transaction['UserID'], []).append(i)
+
+    def record_user(user_id):
+        table = write_pool.table(feature_store.FEATURES_TABLE)
+        for i in sorted(by_user[user_id], key=lambda i: timestamps[i]):
+            try:
+                feature_store.record(table, transactions[i], feature_items.get(user_id), timestamps[i])
+            except Exception as e:
+                print(f"Warning: could not update features for user {user_id}: {e}")
+
+    write_pool.run(record_user, list(by_user))
+
+def predict_fraud_batch(transactions, bundle, features=None):
+    """Run the ML model once over the whole batch.
+
+    Categories the model has never seen are encoded as the reserved unknown code and
+    still scored. `features` skips encoding when the rows are already encoded.
+    Returns all False when there is no model.
+    """
+    flags = np.zeros(len(transactions) if features is None else len(features), dtype=bool)
+    if bundle is None or not len(flags):
+        return flags
     try:
-        encoded = [
-            float(transaction['Amount']),
-            label_encoders["Merchant"].transform([transaction['Merchant']])[0],
-            label_encoders["Category"].transform([transaction['Category']])[0],
-            label_encoders["PaymentMethod"].transform([transaction['PaymentMethod']])[0],
-            label_encoders["Location"].transform([transaction['Location']])[0],
-        ]
-        prediction = model.predict([encoded])
-        return prediction[0] == 1
+        if features is None:
+            features = bundle["encoder"].encode(transactions)
+        flags[:] = bundle["model"].predict(features) == 1
     except Exception as e:
         print(f"Model prediction error: {e}")
-        return False
+    return flags
+
+def predict_fraud(transaction, bundle):
+    return bool(predict_fraud_batch([transaction], bundle)[0])
+
+def refresh_warm_user(user_id, user_info, invocation_start):
+    """Re-read a profile that came from the cache rather than this invocation.
 
-def update_transaction_status(transaction_id, status):
+    Each user is re-read at most once per invocation. Returns the fresh item
+    if its ProfileVersion differs from user_info's, otherwise None. A user
+    already refreshed for an earlier transaction in the batch gets the copy
+    read then, so every transaction of theirs sees the same profile.
+    """
+    loaded_at = user_cache.loaded_at(user_id)
+    if loaded_at is None:
+        return None
+    if loaded_at >= invocation_start:
+        cached = user_cache.peek(user_id)
+        if cached is not None and cached.get('ProfileVersion', 0) != user_info.get('ProfileVersion', 0):
+            return cached
+        return None
+    try:
+        fresh_user = users_table.get_item(Key={'User_ID': user_id}).get('Item', {})
+    except Exception as e:
+        print(f"Warning: could not refresh user {user_id}, using cached profile: {e}")
+        return None
+    # Either way the cached copy now counts as read during this invocation
+    changed = fresh_user.get('ProfileVersion', 0) != user_info.get('ProfileVersion', 0)
+    if changed:
+        print(f"User {user_id} profile changed since it was cached")
+        user_cache.invalidate(user_id)
+    user_cache.put_many({user_id: fresh_user})
+    return fresh_user if changed else None
+
+def transition_transaction_status(transaction_id, from_status, to_status):
+    """Move a transaction from one status to another with a conditional write.
+
+    Returns True if this call made the transition, False if the transaction
+    was no longer in from_status (e.g. a redelivered message that was already
+    alerted). A missing Status counts as Pending. Any other error is raised.
+    """
+    condition = "#s = :from"
+    if from_status == "Pending":
+        condition = "attribute_not_exists(#s) OR #s = :from"
     try:
         transactions_table.update_item(
             Key={'TransactionID': transaction_id},
-            UpdateExpression="SET #s = :val",
+            UpdateExpression="SET #s = :to",
+            ConditionExpression=condition,
             ExpressionAttributeNames={"#s": "Status"},
-            ExpressionAttributeValues={":val": status}
+            ExpressionAttributeValues={":from": from_status, ":to": to_status}
         )
-        print(f"Transaction {transaction_id} status updated to '{status}'")
     except Exception as e:
-        print(f"Error updating transaction status: {e}")
+        if storage.is_conditional_check_failure(e):
+            print(f"Transaction {transaction_id} is no longer '{from_status}', skipping")
+            return False
+        raise
+    print(f"Transaction {transaction_id} status updated to '{to_status}'")
+    return True
+
+def claim_alert(transaction_id, now=None):
+    """Claim a transaction's alert: Pending -> Sent to User, with a lease.
 
-def send_fraud_alert(transaction_id, amount, user_id, phone_number):
-    merchant = "Unknown"
-    location = "Unknown"
+    The claim carries ClaimExpiresAt until the SMS is confirmed sent. If the
+    Lambda dies in between, a redelivery can take the claim over once the
+    lease has run out, so the alert is delayed rather than lost.
 
-    # Fetch transaction details for context
+    Returns CLAIMED, ALREADY_SENT (the SMS went out or the user has already
+    answered), or CLAIM_HELD while another delivery's lease is unexpired, in
+    which case the message should be retried later.
+    """
+    now = int(time.time() if now is None else now)
     try:
-        txn = transactions_table.get_item(Key={'TransactionID': transaction_id})
-        if 'Item' in txn:
-            merchant = txn['Item'].get('Merchant', "Unknown")
-            location = txn['Item'].get('Location', "Unknown")
+        transactions_table.update_item(
+            Key={'TransactionID': transaction_id},
+            UpdateExpression="SET #s = :sent, #lease = :expires",
+            ConditionExpression="attribute_not_exists(#s) OR #s = :pending OR (#s = :sent AND #lease < :now)",
+            ExpressionAttributeNames={"#s": "Status", "#lease": "ClaimExpiresAt"},
+            ExpressionAttributeValues={
+                ":pending": "Pending",
+                ":sent": "Sent to User",
+                ":now": Decimal(now),
+                ":expires": Decimal(now + ALERT_CLAIM_LEASE_SECONDS),
+            }
+        )
     except Exception as e:
-        print(f"Warning: Failed to fetch full transaction context: {e}")
+        if not storage.is_conditional_check_failure(e):
+            raise
+        current = transactions_table.get_item(
+            Key={'TransactionID': transaction_id}, ConsistentRead=True).get('Item', {})
+        if current.get('Status') == "Sent to User" and 'ClaimExpiresAt' in current:
+            print(f"Alert for transaction {transaction_id} is claimed until {current['ClaimExpiresAt']}, will retry")
+            return CLAIM_HELD
+        print(f"Alert for transaction {transaction_id} was already sent, skipping")
+        return ALREADY_SENT
+    print(f"Transaction {transaction_id} status updated to 'Sent to User'")
+    return CLAIMED
+
+def confirm_alert(transaction_id):
+    """Drop the claim lease once the SMS is out, so the alert is never sent again"""
+    try:
+        transactions_table.update_item(
+            Key={'TransactionID': transaction_id},
+            UpdateExpression="REMOVE #lease",
+            ConditionExpression="#s = :sent",
+            ExpressionAttributeNames={"#s": "Status", "#lease": "ClaimExpiresAt"},
+            ExpressionAttributeValues={":sent": "Sent to User"}
+        )
+    except Exception as e:
+        # Already answered by the user, or the lease stays and a later redelivery may resend
+        if not storage.is_conditional_check_failure(e):
+            print(f"Error confirming alert for transaction {transaction_id}: {e}")
+
+def build_fraud_alert(transaction_id, amount, phone_number, transaction=None):
+    # Fetch transaction details for context unless the caller already has them
+    if transaction is None:
+        try:
+            transaction = transactions_table.get_item(Key={'TransactionID': transaction_id}).get('Item', {})
+        except Exception as e:
+            print(f"Warning: Failed to fetch full transaction context: {e}")
+            transaction = {}
+    merchant = transaction.get('Merchant', "Unknown")
+    location = transaction.get('Location', "Unknown")
 
     message = (
         f"Fraud Alert: A recent purchase from {merchant} in {location} for ${amount} "
         f"has been flagged as potential fraud in our system. "
         f"Reply YES to confirm if it is fraud, or NO to deny it. Thank you."
     )
+    return {'TransactionID': transaction_id, 'PhoneNumber': phone_number, 'Body': message}
 
-    try:
-        sms = twilio_client.messages.create(
-            body=message,
-            from_=TWILIO_FROM_NUMBER,
-            to=phone_number
-        )
-        print(f"SMS sent to {phone_number} (SID: {sms.sid})")
-    except Exception as e:
-        print(f"Error sending SMS via Twilio: {e}")
+def send_sms(phone_number, message):
+    sms = twilio_client.messages.create(
+        body=message,
+        from_=TWILIO_FROM_NUMBER,
+        to=phone_number
+    )
+    return sms.sid
+
+# Reused across warm invocations so the thread pool and HTTP connections stay open
+alert_dispatcher = AlertDispatcher(send_sms)
+
+def send_fraud_alerts(alerts):
+    """Send a batch of alerts concurrently and record each delivered one in the mapping table.
+
+    A failed send hands the transaction back to 'Pending' so a redelivery of
+    the message can claim it and try again.
+    """
+    outcomes = alert_dispatcher.dispatch(alerts)
+    for outcome in outcomes:
+        if outcome['Sent']:
+            confirm_alert(outcome['TransactionID'])
+            store_alert_mapping(outcome['PhoneNumber'], outcome['TransactionID'])
+            continue
+        try:
+            transition_transaction_status(outcome['TransactionID'], "Sent to User", "Pending")
+        except Exception as e:
+            print(f"Error releasing transaction {outcome['TransactionID']}: {e}")
+    return outcomes
+
+def send_fraud_alert(transaction_id, amount, user_id, phone_number, transaction=None):
+    return send_fraud_alerts([build_fraud_alert(transaction_id, amount, phone_number, transaction)])[0]
 
+def store_alert_mapping(phone_number, transaction_id):
     try:
         mapping_table.put_item(
             Item={
@@ -0,0 +1,59 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Concurrency and throughput limits for outgoing SMS
+ALERT_WORKERS = int(os.getenv('ALERT_WORKERS', '8'))
+ALERT_RATE_LIMIT = float(os.getenv('ALERT_RATE_LIMIT', '10'))  # messages per second, 0 = unlimited
+
+
+class RateLimiter:
+    """Spaces calls evenly so no more than `rate` happen per second across threads"""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class AlertDispatcher:
+    """Sends a batch of fraud alert SMS concurrently.
+
+    `send(to, body)` delivers one message and returns its SID. Every alert
+    gets an outcome, in the same order as the input, whether or not the send
+    succeeded.
+    """
+
+    def __init__(self, send, max_workers=ALERT_WORKERS, rate_limit=ALERT_RATE_LIMIT):
+        self.send = send
+        self.rate_limiter = RateLimiter(rate_limit)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="sms")
+
+    def dispatch(self, alerts):
+        """alerts: list of dicts with at least 'PhoneNumber' and 'Body'"""
+        futures = [self.executor.submit(self._send_one, alert) for alert in alerts]
+        return [future.result() for future in futures]
+
+    def _send_one(self, alert):
+        outcome = {key: value for key, value in alert.items() if key != 'Body'}
+        self.rate_limiter.acquire()
+        try:
+            outcome['SID'] = self.send(alert['PhoneNumber'], alert['Body'])
+            outcome['Sent'] = True
+            print(f"SMS sent to {alert['PhoneNumber']} (SID: {outcome['SID']})")
+        except Exception as e:
+            outcome['Sent'] = False
+            outcome['Error'] = str(e)
+            print(f"Error sending SMS via Twilio: {e}")
+        return outcome
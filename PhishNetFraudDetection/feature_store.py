@@ -0,0 +1,206 @@
+"""Rolling per-user behavior features, one UserFeatures item per user.
+
+Each window is a run of fixed-length time buckets, stored as top-level
+number attributes on the user's item and named <window>_<bucket>_<stat>:
+
+    n   transactions in the bucket
+    s   sum of their amounts
+    q   sum of squared amounts (variance = q/n - (s/n)^2)
+
+Recording a transaction is a single UpdateItem. It ADDs the transaction to
+the current bucket of every window, which is atomic and O(1). It SETs the
+last location and time, ADDs the merchant to a string set, and REMOVEs the
+buckets that the stored item shows have aged out. The detector reads the
+items for a whole batch with one BatchGetItem and never queries
+transaction history. Within a batch, each transaction is summarized with
+the same user's earlier transactions in the batch folded in, so two
+transactions a minute apart are compared with each other. A transaction
+is only recorded once its message has been handled, so a retried message
+is scored against the same history again rather than against itself.
+
+Windows slide one bucket at a time, so a window covers between its length
+minus one bucket and its full length (1h is 55 to 60 minutes).
+"""
+import time
+from datetime import datetime, timezone
+from decimal import Decimal
+
+from phishnet import storage
+from prefetch import batch_get
+
+FEATURES_TABLE = "UserFeatures"
+KEY = "User_ID"
+
+# window -> (bucket length in seconds, buckets kept)
+WINDOWS = {
+    "1h": (300, 12),
+    "24h": (3600, 24),
+    "30d": (86400, 30),
+}
+STATS = ("n", "s", "q")
+
+
+def transaction_time(transaction):
+    """Epoch seconds of the transaction's Timestamp, or now if it has none"""
+    try:
+        parsed = datetime.fromisoformat(str(transaction['Timestamp']))
+    except (KeyError, ValueError):
+        return time.time()
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def current_buckets(timestamp):
+    """window -> bucket number containing timestamp"""
+    return {window: int(timestamp // length) for window, (length, _) in WINDOWS.items()}
+
+
+def _parse_bucket(name):
+    """(window, bucket, stat) for a bucket attribute name, else None"""
+    parts = name.split("_")
+    if len(parts) != 3 or parts[0] not in WINDOWS or parts[2] not in STATS or not parts[1].isdigit():
+        return None
+    return parts[0], int(parts[1]), parts[2]
+
+
+def _in_window(window, bucket, current):
+    return current - WINDOWS[window][1] < bucket <= current
+
+
+def summarize(item, timestamp):
+    """Features of the history in item, as seen at timestamp.
+
+    Returns a dict with count/mean/std per window ("count_1h", "mean_24h",
+    ...), last_location, seconds_since_last (None without history),
+    distinct_merchants and merchants.
+    """
+    item = item or {}
+    current = current_buckets(timestamp)
+    totals = {window: [0.0, 0.0, 0.0] for window in WINDOWS}
+    for name, value in item.items():
+        parsed = _parse_bucket(name)
+        if parsed and _in_window(parsed[0], parsed[1], current[parsed[0]]):
+            totals[parsed[0]][STATS.index(parsed[2])] += float(value)
+
+    features = {}
+    for window, (count, total, squares) in totals.items():
+        mean = total / count if count else 0.0
+        variance = squares / count - mean * mean if count else 0.0
+        features[f"count_{window}"] = int(count)
+        features[f"mean_{window}"] = mean
+        features[f"std_{window}"] = max(variance, 0.0) ** 0.5
+
+    last_at = item.get('LastTransactionAt')
+    merchants = item.get('Merchants') or set()
+    features.update({
+        "last_location": item.get('LastLocation'),
+        "seconds_since_last": timestamp - float(last_at) if last_at is not None else None,
+        "distinct_merchants": len(merchants),
+        "merchants": merchants,
+    })
+    return features
+
+
+def fold(item, transaction, timestamp):
+    """A copy of item with transaction added, as update_request() would store it
+    (aged-out buckets aside, which summarize() ignores anyway)"""
+    item = dict(item or {})
+    if item.get('LastTransactionID') == transaction.get('TransactionID'):
+        return item
+    amount = Decimal(str(transaction['Amount']))
+    for window, bucket in current_buckets(timestamp).items():
+        for stat, value in zip(STATS, (Decimal(1), amount, amount * amount)):
+            name = f"{window}_{bucket}_{stat}"
+            item[name] = item.get(name, Decimal(0)) + value
+    if transaction.get('Merchant'):
+        item['Merchants'] = set(item.get('Merchants') or ()) | {transaction['Merchant']}
+    item.update({
+        'LastLocation': transaction.get('Location', 'Unknown'),
+        'LastTransactionAt': Decimal(int(timestamp)),
+        'LastTransactionID': transaction.get('TransactionID'),
+    })
+    return item
+
+
+def summarize_batch(transactions, items, timestamps):
+    """summarize() for every transaction in a batch, in time order, each with the
+    same user's earlier transactions in the batch folded into their item"""
+    items = dict(items)
+    summaries = [None] * len(transactions)
+    for i in sorted(range(len(transactions)), key=lambda i: timestamps[i]):
+        user_id = transactions[i].get('UserID')
+        item = items.get(user_id)
+        summaries[i] = summarize(item, timestamps[i])
+        if user_id:
+            items[user_id] = fold(item, transactions[i], timestamps[i])
+    return summaries
+
+
+def load(dynamodb, user_ids):
+    """User_ID -> UserFeatures item for the users that have one, in one strongly
+    consistent BatchGetItem per 100 users"""
+    items, unprocessed = batch_get(dynamodb, FEATURES_TABLE, KEY, user_ids, consistent_read=True)
+    if unprocessed:
+        print(f"Warning: no behavior features for {len(unprocessed)} throttled user(s)")
+    return items
+
+
+def stale_attributes(item, timestamp):
+    """Bucket attributes in item that have aged out of their window"""
+    current = current_buckets(timestamp)
+    stale = []
+    for name in item or {}:
+        parsed = _parse_bucket(name)
+        if parsed and parsed[1] <= current[parsed[0]] - WINDOWS[parsed[0]][1]:
+            stale.append(name)
+    return stale
+
+
+def update_request(transaction, item, timestamp):
+    """UpdateItem arguments that record transaction on top of the stored item"""
+    amount = Decimal(str(transaction['Amount']))
+    names = {"#last": 'LastTransactionID'}
+    values = {":one": Decimal(1), ":amount": amount, ":square": amount * amount,
+              ":txn": transaction['TransactionID']}
+
+    adds = []
+    for window, bucket in current_buckets(timestamp).items():
+        for stat, value in zip(STATS, (":one", ":amount", ":square")):
+            placeholder = f"#{stat}{window}"
+            names[placeholder] = f"{window}_{bucket}_{stat}"
+            adds.append(f"{placeholder} {value}")
+    if transaction.get('Merchant'):
+        names["#merchants"] = 'Merchants'
+        values[":merchant"] = {transaction['Merchant']}
+        adds.append("#merchants :merchant")
+
+    names.update({"#location": 'LastLocation', "#at": 'LastTransactionAt'})
+    values.update({":location": transaction.get('Location', 'Unknown'), ":at": Decimal(int(timestamp))})
+    expression = "ADD " + ", ".join(adds) + " SET #location = :location, #at = :at, #last = :txn"
+
+    stale = stale_attributes(item, timestamp)
+    if stale:
+        for i, name in enumerate(stale):
+            names[f"#stale{i}"] = name
+        expression += " REMOVE " + ", ".join(f"#stale{i}" for i in range(len(stale)))
+
+    return {
+        "Key": {KEY: transaction['UserID']},
+        "UpdateExpression": expression,
+        # A redelivered message must not count its transaction twice
+        "ConditionExpression": "attribute_not_exists(#last) OR #last <> :txn",
+        "ExpressionAttributeNames": names,
+        "ExpressionAttributeValues": values,
+    }
+
+
+def record(table, transaction, item, timestamp):
+    """Add transaction to its user's features. Returns False if it was already the last one recorded"""
+    try:
+        table.update_item(**update_request(transaction, item, timestamp))
+    except Exception as e:
+        if storage.is_conditional_check_failure(e):
+            return False
+        raise
+    return True
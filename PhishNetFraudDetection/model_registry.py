@@ -0,0 +1,103 @@
+import json
+import os
+import threading
+import time
+
+from phishnet import forest, model_bundle
+
+# Model bundle shipped in the Lambda layer
+MODEL_DIR = os.getenv('MODEL_DIR', '/opt')
+
+METRICS_NAMESPACE = "PhishNet/FraudDetection"
+
+
+class ModelRegistry:
+    """Keeps the fraud model bundle warm for the life of the container.
+
+    The bundle is loaded on first use and reused across invocations. It is
+    only reloaded when MODEL_VERSION changes or the file on disk gets a new
+    mtime (e.g. a new layer version was attached). A failed load is
+    remembered too, and only retried once the version or mtime changes.
+    """
+
+    def __init__(self, model_dir=MODEL_DIR):
+        self.model_dir = model_dir
+        self._lock = threading.Lock()
+        self._fingerprint = None
+        self._bundle = None
+        self._failed_fingerprint = None
+        self.metrics = {"loads": 0, "cache_hits": 0, "load_errors": 0, "last_load_seconds": 0.0}
+        self._reported = dict(self.metrics)
+
+    def get(self):
+        """Return the model bundle, with its category lookup dicts under 'mappings',
+        a FeatureEncoder under 'encoder' and a FlatForest under 'model', or None
+        if it can't be loaded"""
+        fingerprint = self._current_fingerprint()
+        with self._lock:
+            if self._bundle is not None and fingerprint == self._fingerprint:
+                self.metrics["cache_hits"] += 1
+                return self._bundle
+            if fingerprint == self._failed_fingerprint:
+                return None
+
+            start = time.perf_counter()
+            try:
+                # One memory-mapped read of plain arrays; scikit-learn is never imported
+                bundle = model_bundle.load(os.path.join(self.model_dir, model_bundle.BUNDLE_FILE))
+                bundle["mappings"] = model_bundle.mappings(bundle)
+                bundle["encoder"] = model_bundle.FeatureEncoder(bundle["mappings"])
+                bundle["model"] = forest.FlatForest(bundle["forest"])
+            except Exception as e:
+                self.metrics["load_errors"] += 1
+                self._failed_fingerprint = fingerprint
+                print(f"Error loading fraud model from {self.model_dir}: {e}")
+                return None
+
+            self._bundle = bundle
+            self._fingerprint = fingerprint
+            self._failed_fingerprint = None
+            self.metrics["loads"] += 1
+            self.metrics["last_load_seconds"] = time.perf_counter() - start
+            print(f"Loaded fraud model {bundle['version']} (MODEL_VERSION {fingerprint[0]}) "
+                  f"in {self.metrics['last_load_seconds']:.3f}s")
+            return self._bundle
+
+    def _current_fingerprint(self):
+        """Model version plus the mtime of the bundle file"""
+        try:
+            mtime = os.stat(os.path.join(self.model_dir, model_bundle.BUNDLE_FILE)).st_mtime_ns
+        except OSError:
+            mtime = None
+        return (os.getenv('MODEL_VERSION', 'unversioned'), mtime)
+
+    def emit_metrics(self):
+        """Print the counters since the last call as a CloudWatch Embedded Metric Format record"""
+        with self._lock:
+            current = dict(self.metrics)
+            delta = {name: current[name] - self._reported[name] for name in ("loads", "cache_hits", "load_errors")}
+            self._reported = current
+        load_time = current["last_load_seconds"] if delta["loads"] else 0.0
+        print(json.dumps({
+            "_aws": {
+                "Timestamp": int(time.time() * 1000),
+                "CloudWatchMetrics": [{
+                    "Namespace": METRICS_NAMESPACE,
+                    "Dimensions": [[]],
+                    "Metrics": [
+                        {"Name": "ModelLoads", "Unit": "Count"},
+                        {"Name": "ModelCacheHits", "Unit": "Count"},
+                        {"Name": "ModelLoadErrors", "Unit": "Count"},
+                        {"Name": "ModelLoadTime", "Unit": "Seconds"},
+                    ],
+                }],
+            },
+            "ModelLoads": delta["loads"],
+            "ModelCacheHits": delta["cache_hits"],
+            "ModelLoadErrors": delta["load_errors"],
+            "ModelLoadTime": load_time,
+        }))
+
+
+# Shared per-container registry
+registry = ModelRegistry()
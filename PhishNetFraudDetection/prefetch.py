@@ -0,0 +1,75 @@
+import random
+import time
+
+# DynamoDB allows at most 100 keys per BatchGetItem request
+BATCH_GET_LIMIT = 100
+MAX_RETRIES = 5
+BASE_BACKOFF_SECONDS = 0.05
+
+
+def batch_get(dynamodb, table_name, key_name, key_values, consistent_read=False):
+    """Fetch items by key with BatchGetItem, retrying UnprocessedKeys with backoff.
+    consistent_read asks for strongly consistent reads, which see every
+    write that finished before the call.
+
+    Returns (items, unprocessed): a dict of key value -> item, and the key
+    values DynamoDB still hadn't served after all retries. Keys that don't
+    exist are in neither. Duplicate key values are only requested once.
+    """
+    unique_keys = list(dict.fromkeys(k for k in key_values if k))
+    items = {}
+    unprocessed = set()
+
+    for start in range(0, len(unique_keys), BATCH_GET_LIMIT):
+        request = {table_name: {"Keys": [{key_name: k} for k in unique_keys[start:start + BATCH_GET_LIMIT]]}}
+        if consistent_read:
+            request[table_name]["ConsistentRead"] = True
+        attempt = 0
+        while request:
+            response = dynamodb.batch_get_item(RequestItems=request)
+            for item in response.get("Responses", {}).get(table_name, []):
+                items[item[key_name]] = item
+
+            request = response.get("UnprocessedKeys") or {}
+            if not request:
+                break
+            attempt += 1
+            if attempt > MAX_RETRIES:
+                missed = [key[key_name] for key in request.get(table_name, {}).get("Keys", [])]
+                unprocessed.update(missed)
+                print(f"Giving up on {len(missed)} unprocessed keys from {table_name} after {MAX_RETRIES} retries")
+                break
+            # Exponential backoff with full jitter
+            time.sleep(random.uniform(0, BASE_BACKOFF_SECONDS * (2 ** attempt)))
+
+    return items, unprocessed
+
+
+def prefetch_batch(dynamodb, transaction_ids, known_transactions=None, user_cache=None,
+                   transactions_table="Transactions", users_table="Users"):
+    """Load every transaction in an SQS batch and the users they belong to.
+
+    Transactions already in known_transactions (e.g. carried in the message
+    body) are not read again. Users shared by several transactions are
+    fetched once, and users still warm in user_cache are not fetched at all.
+
+    Returns (transactions, users, unprocessed): dicts keyed by TransactionID
+    and User_ID, plus the TransactionIDs that couldn't be fully loaded
+    because DynamoDB kept throttling the transaction or its user.
+    """
+    transactions = dict(known_transactions or {})
+    missing = [txn_id for txn_id in transaction_ids if txn_id not in transactions]
+    unprocessed = set()
+    if missing:
+        fetched, unprocessed = batch_get(dynamodb, transactions_table, "TransactionID", missing)
+        transactions.update(fetched)
+    user_ids = [txn.get("UserID") for txn in transactions.values() if txn.get("UserID")]
+    users = {}
+    if user_cache is not None:
+        users, user_ids = user_cache.get_many(user_ids)
+    fetched_users, unprocessed_users = batch_get(dynamodb, users_table, "User_ID", user_ids)
+    if user_cache is not None:
+        user_cache.put_many(fetched_users)
+    users.update(fetched_users)
+    unprocessed.update(txn_id for txn_id, txn in transactions.items() if txn.get("UserID") in unprocessed_users)
+    return transactions, users, unprocessed
@@ -0,0 +1,63 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class UserProfileCache:
+    """Bounded LRU cache of Users items with a per-entry TTL.
+
+    Entries remember when they were loaded so callers can tell a profile read
+    during the current invocation from one that was served warm.
+    """
+
+    def __init__(self, max_size=10000, ttl_seconds=60):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()  # user_id -> (loaded_at, item)
+        self._lock = threading.Lock()
+        self.metrics = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+    def get_many(self, user_ids):
+        """Returns (found, missing): cached items by user ID, and the IDs to fetch"""
+        found = {}
+        missing = []
+        now = time.monotonic()
+        with self._lock:
+            for user_id in dict.fromkeys(user_ids):
+                entry = self._entries.get(user_id)
+                if entry is None or now - entry[0] > self.ttl_seconds:
+                    self._entries.pop(user_id, None)
+                    missing.append(user_id)
+                    self.metrics["misses"] += 1
+                    continue
+                self._entries.move_to_end(user_id)
+                found[user_id] = entry[1]
+                self.metrics["hits"] += 1
+        return found, missing
+
+    def put_many(self, items_by_id):
+        now = time.monotonic()
+        with self._lock:
+            for user_id, item in items_by_id.items():
+                self._entries[user_id] = (now, item)
+                self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.metrics["evictions"] += 1
+
+    def peek(self, user_id):
+        """The cached item, however old, without touching the LRU order or metrics"""
+        with self._lock:
+            entry = self._entries.get(user_id)
+        return entry[1] if entry else None
+
+    def loaded_at(self, user_id):
+        """Monotonic time the cached profile was loaded, or None if it isn't cached"""
+        with self._lock:
+            entry = self._entries.get(user_id)
+        return entry[0] if entry else None
+
+    def invalidate(self, user_id):
+        with self._lock:
+            if self._entries.pop(user_id, None) is not None:
+                self.metrics["invalidations"] += 1
@@ -0,0 +1,150 @@
+"""Velocity rules over time-bucketed counters, per user and per merchant.
+
+Every transaction is counted into one VelocityCounters item per
+(subject, bucket length), keyed "<subject>#<value>#<bucket length>#<bucket>".
+Recording a batch sums the transactions that land in the same counter
+(merchant buckets repeat constantly) and ADDs each total to Count and
+Amount with one UpdateItem, with the distinct updates running
+concurrently. It costs the same however much history a user has. Each item
+carries an ExpiresAt for DynamoDB TTL, so old buckets delete themselves.
+
+The rules themselves are the "velocity" list in phishnet/rules.json. A
+rule fires when the buckets covering its window hold more than `limit`
+transactions (`count`) or dollars (`amount`). The detector records a batch
+first and then reads every bucket it needs with a strongly consistent
+BatchGetItem, so a transaction counts towards its own burst. Before a
+transaction is counted, a conditional put creates its "counted#<TransactionID>"
+marker in the same table. A redelivered message finds the marker and isn't
+counted again, however many other transactions came in between. Markers
+expire with the last bucket the transaction was counted in.
+"""
+from decimal import Decimal
+
+import numpy as np
+
+from phishnet import storage
+from prefetch import batch_get
+
+COUNTERS_TABLE = "VelocityCounters"
+KEY = "CounterID"
+
+SUBJECT_FIELDS = {"user": "UserID", "merchant": "Merchant"}
+
+
+def counter_id(subject, value, bucket_seconds, bucket):
+    return f"{subject}#{value}#{bucket_seconds}#{bucket}"
+
+
+def marker_id(transaction_id):
+    return f"counted#{transaction_id}"
+
+
+def _resolutions(rules):
+    """(subject, bucket length) -> longest window counted at that resolution"""
+    resolutions = {}
+    for rule in rules:
+        key = (rule["subject"], rule["bucket"])
+        resolutions[key] = max(resolutions.get(key, 0), rule["window"])
+    return resolutions
+
+
+def counter_updates(transactions, timestamps, rules):
+    """CounterID -> [count, amount, expires at] to add for a batch, with the
+    transactions that fall into the same bucket summed into one update"""
+    resolutions = _resolutions(rules)
+    updates = {}
+    for transaction, timestamp in zip(transactions, timestamps):
+        amount = Decimal(str(transaction['Amount']))
+        for (subject, bucket_seconds), window in resolutions.items():
+            value = transaction.get(SUBJECT_FIELDS[subject])
+            if not value:
+                continue
+            bucket = int(timestamp // bucket_seconds)
+            counter = counter_id(subject, value, bucket_seconds, bucket)
+            if counter not in updates:
+                updates[counter] = [0, Decimal(0), (bucket + 1) * bucket_seconds + window]
+            updates[counter][0] += 1
+            updates[counter][1] += amount
+    return updates
+
+
+def _add(table, counter, count, amount, expires):
+    table.update_item(
+        Key={KEY: counter},
+        UpdateExpression="ADD #count :count, #amount :amount SET #expires = :expires",
+        ExpressionAttributeNames={"#count": 'Count', "#amount": 'Amount', "#expires": 'ExpiresAt'},
+        ExpressionAttributeValues={":count": Decimal(count), ":amount": amount, ":expires": Decimal(expires)},
+    )
+
+
+def _mark(table, transaction_id, expires):
+    """Create the transaction's marker. Returns False if it was already counted"""
+    try:
+        table.put_item(Item={KEY: marker_id(transaction_id), 'ExpiresAt': Decimal(expires)},
+                       ConditionExpression="attribute_not_exists(#key)", ExpressionAttributeNames={"#key": KEY})
+    except Exception as e:
+        if storage.is_conditional_check_failure(e):
+            return False
+        raise
+    return True
+
+
+def record(pool, transactions, timestamps, rules):
+    """Count a batch into the current bucket of every resolution the rules use,
+    one concurrent UpdateItem per distinct counter on a write_pool.WritePool.
+    Transactions that already have a marker are skipped. Raises the first
+    error if any marker or counter could not be written."""
+    resolutions = _resolutions(rules)
+    if not resolutions:
+        return 0
+    longest = max(bucket_seconds + window for (_, bucket_seconds), window in resolutions.items())
+    marks = pool.run(lambda i: _mark(pool.table(COUNTERS_TABLE), transactions[i]['TransactionID'],
+                                     int(timestamps[i]) + longest),
+                     range(len(transactions)))
+    # Transactions marked just now are counted even if other markers failed
+    fresh = [i for i, marked in enumerate(marks) if marked is True]
+    updates = counter_updates([transactions[i] for i in fresh], [timestamps[i] for i in fresh], rules)
+    results = pool.run(lambda update: _add(pool.table(COUNTERS_TABLE), update[0], *update[1]), list(updates.items()))
+    errors = [result for result in marks + results if isinstance(result, Exception)]
+    if errors:
+        raise errors[0]
+    return len(updates)
+
+
+def _window_ids(rule, value, timestamp):
+    current = int(timestamp // rule["bucket"])
+    buckets = rule["window"] // rule["bucket"]
+    return [counter_id(rule["subject"], value, rule["bucket"], bucket)
+            for bucket in range(current - buckets + 1, current + 1)]
+
+
+def load(dynamodb, transactions, timestamps, rules):
+    """CounterID -> counter item for every bucket the rules look at, for the whole batch"""
+    ids = []
+    for transaction, timestamp in zip(transactions, timestamps):
+        for rule in rules:
+            value = transaction.get(SUBJECT_FIELDS[rule["subject"]])
+            if value:
+                ids.extend(_window_ids(rule, value, timestamp))
+    items, unprocessed = batch_get(dynamodb, COUNTERS_TABLE, KEY, ids, consistent_read=True)
+    if unprocessed:
+        print(f"Warning: {len(unprocessed)} velocity counters could not be read (throttled)")
+    return items
+
+
+def risk_scores(transactions, timestamps, counters, rules):
+    """Summed score of the velocity rules each transaction trips, as an array"""
+    scores = np.zeros(len(transactions))
+    for i, (transaction, timestamp) in enumerate(zip(transactions, timestamps)):
+        for rule in rules:
+            value = transaction.get(SUBJECT_FIELDS[rule["subject"]])
+            if not value:
+                continue
+            field = 'Count' if rule["measure"] == "count" else 'Amount'
+            total = sum(float(counters[counter][field]) for counter in _window_ids(rule, value, timestamp)
+                        if counter in counters)
+            if total > rule["limit"]:
+                print(f"Velocity rule {rule['name']} tripped for transaction "
+                      f"{transaction.get('TransactionID')}: {total:g} > {rule['limit']}")
+                scores[i] += rule["score"]
+    return scores
@@ -0,0 +1,41 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from phishnet import storage
+
+# Concurrent DynamoDB writes per invocation
+WRITE_WORKERS = int(os.getenv('WRITE_WORKERS', '8'))
+
+
+class WritePool:
+    """Runs independent DynamoDB writes concurrently.
+
+    boto3 resources aren't thread safe, so every worker thread builds its own
+    Table handles on first use and keeps them for the life of the container.
+    """
+
+    def __init__(self, max_workers=WRITE_WORKERS):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ddb")
+        self._local = threading.local()
+
+    def table(self, name):
+        """The calling thread's handle on table `name`"""
+        tables = getattr(self._local, "tables", None)
+        if tables is None:
+            tables = self._local.tables = {}
+        if name not in tables:
+            tables[name] = storage.table(name, fresh=True)
+        return tables[name]
+
+    def run(self, function, items):
+        """function(item) for every item, concurrently. Returns the results in
+        order, with the exception in place of the result of a call that raised."""
+        futures = [self.executor.submit(function, item) for item in items]
+        results = []
+        for future in futures:
+            try:
+                results.append(future.result())
+            except Exception as e:
+                results.append(e)
+        return results
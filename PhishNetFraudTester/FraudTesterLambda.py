@@ -1,15 +1,23 @@
 import json
-import boto3
 import random
 import uuid
+from phishnet import clients, rules
 from decimal import Decimal
 import datetime
 
 # Connect to your DynamoDB tables
 # Final Code
-dynamodb = boto3.resource('dynamodb')
-TRANSACTIONS_TABLE = dynamodb.Table("TestTransactions")
-TEST_RESULTS_TABLE = dynamodb.Table("TestResults")  # New table to store test results
+TRANSACTIONS_TABLE = clients.table("TestTransactions")
+TEST_RESULTS_TABLE = clients.table("TestResults")  # New table to store test results
+
+# Share of generated transactions that are fraudulent
+FRAUD_RATE = 0.5
+
+# Amount ranges and how strongly each points to fraud; the top two are above
+# the amount tiers in phishnet/rules.json
+amount_fraud_weights = {
+    (10, 100): 0.1, (100, 500): 0.2, (500, 1000): 0.4, (1000, 3000): 0.6, (3000, 10000): 0.8,
+}
 
 def lambda_handler(event, context):
     # Generate test data with known fraud status (10 test transactions)
@@ -42,20 +50,8 @@ def generate_test_data(num_transactions):
     """Generate test transactions with known fraud status"""
     test_data = []
     
-    # Merchant risk weights from your actual system
-    merchant_fraud_weights = {
-        "Amazon": 0.2, "Walmart": 0.15, "Target": 0.2, "Starbucks": 0.1,
-        "McDonald's": 0.1, "Best Buy": 0.3, "Apple Store": 0.25, "Gas Station": 0.25,
-        "Grocery Store": 0.3, "Restaurant": 0.3, "Hotel": 0.5, "Airline": 0.7,
-        "Online Service": 0.55, "Luxury Goods": 0.65, "Electronics Depot": 0.4,
-        "Travel Agency": 0.6, "VIP Lounge": 0.7, "Crypto Exchange": 0.75,
-        "Fine Jewelry": 0.7, "Designer Apparel": 0.6, "Furniture Gallery": 0.5,
-        "High-End Electronics": 0.65, "Digital Subscriptions": 0.35,
-        "Streaming Service": 0.3, "Fitness Club": 0.25, "Spa & Wellness": 0.4,
-        "Boutique Store": 0.45, "Private Clinic": 0.5, "Ride Share": 0.3,
-        "Event Tickets": 0.4, "Car Rental": 0.55, "Tech Startup": 0.5,
-        "Generic Marketplace": 0.6
-    }
+    # Merchant risk weights from the shared scoring rules
+    merchant_fraud_weights = rules.registry.get().merchant_weights
     
     locations = [
         "New York", "Los Angeles", "Chicago", "Miami", "London", "Tokyo", "Dubai",
@@ -85,9 +81,15 @@ def generate_test_data(num_transactions):
         "Baltimore", "New Orleans", "Omaha", "Oklahoma City", "Louisville", "Richmond"
     ]
     
+    # Unlisted cities sit between the high- and low-risk ones
+    location_fraud_weights = {location: 0.5 for location in locations}
+    location_fraud_weights.update({location: 0.1 for location in low_risk_locations})
+    location_fraud_weights.update({location: 0.9 for location in high_risk_locations})
+
     # Generate both fraudulent and legitimate transactions
     for i in range(num_transactions):
-        
+        is_fraud = random.random() < FRAUD_RATE
+
         # Select merchant, location, price based on fraud likelihood
         if is_fraud:
             # Merchants: biased to high risk
@@ -138,7 +140,8 @@ def generate_test_data(num_transactions):
     return test_data
 
 def test_rule_based_algorithm(test_data):
-    """Test rule-based fraud detection algorithm"""
+    """Test the production rule-based fraud detection rules (phishnet/rules.json)"""
+    rule_set = rules.registry.get()
     true_positives = 0
     false_positives = 0
     true_negatives = 0
@@ -149,15 +152,13 @@ def test_rule_based_algorithm(test_data):
         location = transaction['Location']
         risk_score = float(transaction['RiskScore'])  # Convert Decimal to float for calculation
         
-        # Calculate fraud score using your rule-based approach
-        location_risk = 30 if location in ["Dubai", "Tokyo", "London"] else 0
-        
-        amount_float = float(amount)
-        amount_risk = 40 if amount_float > 500 else (20 if amount_float > 100 else 0)
+        # Calculate fraud score using the same rules as FraudDetectionLambda
+        location_risk = rule_set.location_risk(location)
+        amount_risk = rule_set.amount_score(amount)
         fraud_score = (risk_score * 100) + amount_risk + location_risk
         
         # Determine if transaction is flagged as fraud
-        is_flagged_fraud = fraud_score > 80
+        is_flagged_fraud = fraud_score > rule_set.fraud_threshold
         is_actual_fraud = transaction['IsActualFraud']
         
         # Update counters
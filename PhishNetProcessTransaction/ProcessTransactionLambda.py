@@ -1,21 +1,49 @@
 import json
-import boto3
+import os
 import random
+import time
 import uuid
 from decimal import Decimal
 from datetime import datetime
-from boto3.dynamodb.conditions import Key
+from phishnet import clients, rules
+from user_sampler import UserSampler
 
 # AWS Clients
-sqs = boto3.client('sqs')
-dynamodb = boto3.resource('dynamodb')
+sqs = clients.Lazy(clients.sqs)
 
 # Set SQS Queue URL and Tables
 SQS_QUEUE_URL = "https://sqs.us-east-2.amazonaws.com/842675989308/PhishNetQueue"
-TRANSACTION_TABLE = dynamodb.Table("Transactions")
-USER_TABLE = dynamodb.Table("Users")
+TRANSACTION_TABLE = clients.table("Transactions")
+
+# Send the full transaction in the SQS message instead of only its ID
+FAT_MESSAGES = os.getenv('FAT_MESSAGES', 'false').lower() == 'true'
+
+# Bulk mode limits
+SQS_BATCH_SIZE = 10  # max entries per send_message_batch
+WRITE_GROUP_SIZE = 50  # transactions written before their messages are enqueued
+
+# Merchants the simulator picks from; their risk weights are in the shared
+# scoring rules (phishnet/rules.json)
+MERCHANTS = [
+    "Amazon", "Walmart", "Target", "Starbucks", "McDonald's", "Best Buy", "Apple Store",
+    "Gas Station", "Grocery Store", "Restaurant", "Hotel", "Airline", "Online Service",
+]
+
+# User IDs survive across warm invocations and are refreshed after USER_CACHE_TTL seconds
+user_sampler = UserSampler(
+    "Users",
+    weight_attribute=os.getenv('USER_WEIGHT_ATTRIBUTE') or None,
+    ttl_seconds=float(os.getenv('USER_CACHE_TTL', '300')),
+    total_segments=int(os.getenv('USER_SCAN_SEGMENTS', '1')),
+)
 
 def lambda_handler(event, context):
+    # Bulk mode: {"count": N, "rate": transactions per second (0 = as fast as possible)}
+    event = event or {}
+    count = int(event.get('count', 1))
+    if count > 1:
+        return produce_bulk(count, float(event.get('rate', 0)))
+
     # Get a user from the Users table
     user_id = get_random_user_id()
     if not user_id:
@@ -27,10 +55,10 @@ def lambda_handler(event, context):
     # Store transaction in DynamoDB
     upload_to_dynamodb(transaction_data)
 
-    # Send transaction ID to SQS
+    # Send transaction (or just its ID) to SQS
     response = sqs.send_message(
         QueueUrl=SQS_QUEUE_URL,
-        MessageBody=json.dumps({"TransactionID": transaction_data["TransactionID"]})
+        MessageBody=build_message_body(transaction_data)
     )
 
     print(f"Transaction ID {transaction_data['TransactionID']} sent to SQS")
@@ -38,42 +66,77 @@ def lambda_handler(event, context):
     return {"statusCode": 200, "body": "Transaction created and sent to SQS"}
 
 def get_random_user_id():
-    """Scan the Users table and pick a random user ID (Phone Number)"""
-    try:
-        response = USER_TABLE.scan(ProjectionExpression="User_ID")
-        users = response.get("Items", [])
-        if not users:
-            print("No users found in Users table.")
-            return None
-        user_id = random.choice(users)["User_ID"]
-        print(f"Selected User ID: {user_id}")
-        return "+19495329113"
-    except Exception as e:
-        print(f"Error reading from Users table: {e}")
+    """Pick a random user ID (Phone Number) from the cached Users snapshot"""
+    user_id = user_sampler.sample()
+    if not user_id:
+        print("No users found in Users table.")
         return None
+    print(f"Selected User ID: {user_id}")
+    return "+19495329113"
+
+def produce_bulk(count, rate=0):
+    """Generate `count` transactions for randomly sampled users, paced to `rate` per second.
+
+    Transactions are written with a batch writer and enqueued ten at a time.
+    Each group is fully written before its messages are sent, so the
+    detector never receives an ID it can't read yet.
+    """
+    user_ids = user_sampler.sample_many(count)
+    if not user_ids:
+        return {"statusCode": 500, "body": "No users available in the Users table."}
+
+    start = time.monotonic()
+    enqueued = 0
+    failed = 0
+    for group_start in range(0, count, WRITE_GROUP_SIZE):
+        group = [generate_transaction(user_id)
+                 for user_id in user_ids[group_start:group_start + WRITE_GROUP_SIZE]]
+        with TRANSACTION_TABLE.batch_writer() as writer:
+            for transaction_data in group:
+                writer.put_item(Item=transaction_data)
+
+        for batch_start in range(0, len(group), SQS_BATCH_SIZE):
+            if rate > 0:
+                delay = start + (enqueued + failed) / rate - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+            sent = send_message_batch(group[batch_start:batch_start + SQS_BATCH_SIZE])
+            enqueued += sent
+            failed += min(SQS_BATCH_SIZE, len(group) - batch_start) - sent
+
+    elapsed = time.monotonic() - start
+    print(f"Bulk mode: {enqueued} transactions sent to SQS, {failed} failed, in {elapsed:.1f}s")
+    return {
+        "statusCode": 200 if not failed else 207,
+        "body": json.dumps({"sent": enqueued, "failed": failed, "seconds": round(elapsed, 3)})
+    }
+
+def send_message_batch(transactions):
+    """Enqueue up to ten transactions in one request, retrying failed entries once.
+
+    Returns how many were accepted.
+    """
+    entries = {str(i): build_message_body(t) for i, t in enumerate(transactions)}
+    for attempt in range(2):
+        try:
+            response = sqs.send_message_batch(
+                QueueUrl=SQS_QUEUE_URL,
+                Entries=[{"Id": entry_id, "MessageBody": body} for entry_id, body in entries.items()]
+            )
+        except Exception as e:
+            print(f"Error sending message batch to SQS: {e}")
+            continue
+        entries = {f["Id"]: entries[f["Id"]] for f in response.get("Failed", [])}
+        if not entries:
+            break
+    return len(transactions) - len(entries)
 
 def generate_transaction(user_id):
     """Generate a single realistic transaction using an existing user"""
     transaction_id = f"txn_{uuid.uuid4().hex[:10]}"
 
-    merchant_fraud_weights = {
-        "Amazon": 0.2,
-        "Walmart": 0.15,
-        "Target": 0.2,
-        "Starbucks": 0.1,
-        "McDonald's": 0.1,
-        "Best Buy": 0.3,
-        "Apple Store": 0.25,
-        "Gas Station": 0.25,
-        "Grocery Store": 0.3,
-        "Restaurant": 0.3,
-        "Hotel": 0.5,
-        "Airline": 0.7,
-        "Online Service": 0.55
-    }
-
-    selected_merchant = random.choice(list(merchant_fraud_weights.keys()))
-    fraud_risk = merchant_fraud_weights[selected_merchant]
+    selected_merchant = random.choice(MERCHANTS)
+    fraud_risk = rules.registry.get().merchant_weight(selected_merchant)
     amount = round(random.uniform(10, 500), 2)
     location = random.choice(["New York", "Los Angeles", "Chicago", "Miami", "London", "Tokyo", "Dubai"])
 
@@ -92,6 +155,23 @@ def generate_transaction(user_id):
 
     return transaction
 
+def build_message_body(transaction_data):
+    """Compact JSON body for the fraud detection queue.
+
+    In fat message mode the whole transaction rides along so the consumer can
+    score it without reading it back from DynamoDB. Decimals are written as
+    plain JSON numbers; the consumer parses them back with parse_float=Decimal.
+    """
+    message = {"TransactionID": transaction_data["TransactionID"]}
+    if FAT_MESSAGES:
+        message["Transaction"] = transaction_data
+    return json.dumps(message, separators=(',', ':'), default=encode_decimal)
+
+def encode_decimal(value):
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
 def upload_to_dynamodb(transaction_data):
     """Upload transaction to DynamoDB"""
     try:
@@ -0,0 +1,138 @@
+import random
+import threading
+import time
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+
+from phishnet import storage
+
+
+class UserSampler:
+    """Picks random user IDs from an in-memory snapshot of the Users table.
+
+    The table is paged through once (optionally as a parallel scan with
+    TotalSegments workers) and the IDs are kept in a tuple until the snapshot
+    is older than ttl_seconds. Sampling is O(1): uniform picks index the
+    tuple directly, weighted picks use an alias table built at load time.
+    A failed scan keeps the previous snapshot until the next TTL, or, if
+    there is none yet, is retried after retry_seconds.
+    """
+
+    def __init__(self, table_name, key_name="User_ID", weight_attribute=None,
+                 ttl_seconds=300, total_segments=1, table_factory=None, retry_seconds=5):
+        self.table_name = table_name
+        self.key_name = key_name
+        self.weight_attribute = weight_attribute
+        self.ttl_seconds = ttl_seconds
+        self.retry_seconds = retry_seconds
+        self.total_segments = max(1, total_segments)
+        # Each scan worker gets its own Table, boto3 resources aren't thread safe
+        self.table_factory = table_factory or (lambda: storage.table(table_name, fresh=True))
+        self._lock = threading.Lock()
+        self._user_ids = ()
+        self._probabilities = None
+        self._aliases = None
+        self._loaded_at = None
+        self._has_snapshot = False
+
+    def sample(self, rng=random):
+        """One random user ID, or None if the table is empty"""
+        user_ids, probabilities, aliases = self._snapshot()
+        if not user_ids:
+            return None
+        return _pick(user_ids, probabilities, aliases, rng)
+
+    def sample_many(self, count, rng=random):
+        """`count` random user IDs (with replacement), or [] if the table is empty"""
+        user_ids, probabilities, aliases = self._snapshot()
+        if not user_ids:
+            return []
+        return [_pick(user_ids, probabilities, aliases, rng) for _ in range(count)]
+
+    def user_ids(self):
+        return self._snapshot()[0]
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded_at = None
+
+    def _snapshot(self):
+        with self._lock:
+            if self._loaded_at is None or time.monotonic() - self._loaded_at > self.ttl_seconds:
+                self._load()
+            return self._user_ids, self._probabilities, self._aliases
+
+    def _load(self):
+        start = time.monotonic()
+        try:
+            if self.total_segments == 1:
+                items = self._scan_segment(None)
+            else:
+                with ThreadPoolExecutor(max_workers=self.total_segments) as executor:
+                    segments = executor.map(self._scan_segment, range(self.total_segments))
+                    items = [item for segment in segments for item in segment]
+        except Exception as e:
+            print(f"Error reading from {self.table_name} table: {e}")
+            if self._has_snapshot:
+                # Keep serving the previous snapshot and try again after the next TTL
+                self._loaded_at = time.monotonic()
+            else:
+                # Nothing to serve yet, so try again soon rather than after a whole TTL
+                self._loaded_at = time.monotonic() - self.ttl_seconds + self.retry_seconds
+            return
+
+        self._user_ids = tuple(item[self.key_name] for item in items)
+        self._probabilities, self._aliases = None, None
+        if self.weight_attribute and self._user_ids:
+            weights = [float(item.get(self.weight_attribute, 1)) for item in items]
+            self._probabilities, self._aliases = build_alias_table(weights)
+        self._loaded_at = time.monotonic()
+        self._has_snapshot = True
+        print(f"Loaded {len(self._user_ids)} user IDs from {self.table_name} in {self._loaded_at - start:.2f}s")
+
+    def _scan_segment(self, segment):
+        """Every item in one scan segment (or the whole table), following LastEvaluatedKey"""
+        table = self.table_factory()
+        projection = [self.key_name] + ([self.weight_attribute] if self.weight_attribute else [])
+        kwargs = {
+            "ProjectionExpression": ", ".join(f"#p{i}" for i in range(len(projection))),
+            "ExpressionAttributeNames": {f"#p{i}": name for i, name in enumerate(projection)},
+        }
+        if segment is not None:
+            kwargs.update(Segment=segment, TotalSegments=self.total_segments)
+
+        items = []
+        while True:
+            response = table.scan(**kwargs)
+            items.extend(response.get("Items", []))
+            if "LastEvaluatedKey" not in response:
+                return items
+            kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+
+def _pick(user_ids, probabilities, aliases, rng):
+    i = rng.randrange(len(user_ids))
+    if probabilities is not None and rng.random() >= probabilities[i]:
+        i = aliases[i]
+    return user_ids[i]
+
+
+def build_alias_table(weights):
+    """Vose's alias method: returns (probabilities, aliases) for O(1) weighted sampling"""
+    n = len(weights)
+    total = sum(weights)
+    if total <= 0:
+        weights, total = [1.0] * n, float(n)
+    scaled = [w * n / total for w in weights]
+    probabilities = array('d', [1.0] * n)
+    aliases = array('l', range(n))
+
+    small = [i for i, p in enumerate(scaled) if p < 1.0]
+    large = [i for i, p in enumerate(scaled) if p >= 1.0]
+    while small and large:
+        s, l = small.pop(), large.pop()
+        probabilities[s] = scaled[s]
+        aliases[s] = l
+        scaled[l] -= 1.0 - scaled[s]
+        (small if scaled[l] < 1.0 else large).append(l)
+    return probabilities, aliases
@@ -0,0 +1,71 @@
+"""Helpers shared by the benchmark scripts."""
+import json
+import os
+import platform
+import subprocess
+import sys
+from datetime import datetime, timezone
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Every Lambda lives in its own folder and imports its siblings by module name
+LAMBDA_DIRS = [
+    "PhishNetCommon",
+    "PhishNetProcessTransaction",
+    "PhishNetFraudDetection",
+    "HandleUserResponse",
+    "PhishNetFraudTester",
+    os.path.join("Extra", "data-generation"),
+]
+
+
+def add_lambda_paths():
+    for directory in LAMBDA_DIRS:
+        path = os.path.join(REPO_ROOT, directory)
+        if path not in sys.path:
+            sys.path.insert(0, path)
+
+
+def percentiles(samples, points=(50, 95, 99)):
+    """Nearest-rank percentiles of a list of numbers, keyed like 'p50'"""
+    if not samples:
+        return {f"p{p}": None for p in points}
+    ordered = sorted(samples)
+    return {f"p{p}": ordered[min(len(ordered) - 1, max(0, int(round(p / 100 * len(ordered))) - 1))]
+            for p in points}
+
+
+def run_metadata():
+    """Where and on what code a benchmark ran, saved next to its results"""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=REPO_ROOT, capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+    }
+
+
+def train_bench_model(generate_data, users, seed, transactions=50_000, trees=20):
+    """Small forest trained on generated transactions, for benchmarks run without
+    a trained model. Returns (bundle, scikit-learn model)"""
+    import numpy as np
+    from sklearn.ensemble import RandomForestClassifier
+    from phishnet import forest, model_bundle
+
+    chunk = next(generate_data.generate_transaction_chunks(users, transactions, chunk_size=transactions, seed=seed))
+    vocabulary = {column: {value: code for code, value in enumerate(np.unique(chunk[column]).tolist(), start=1)}
+                  for column in model_bundle.CATEGORICAL_FEATURES}
+    X = model_bundle.FeatureEncoder(vocabulary).encode_columns(chunk)
+    model = RandomForestClassifier(n_estimators=trees, random_state=seed).fit(X, chunk["IsFraud"])
+    return model_bundle.build(forest.flatten(model), vocabulary, "bench"), model
+
+
+def save_results(results, path):
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2, default=str)
+    print(f"Results saved to {path}")
@@ -0,0 +1,151 @@
+"""Categorical feature encoding benchmark.
+
+Compares the ways FraudDetectionLambda has turned transactions into model
+input:
+
+    labelencoder_per_row   four LabelEncoder.transform([value]) calls per
+                           transaction (the original predict_fraud)
+    labelencoder_batch     np.isin + transform per column over a batch
+    feature_encoder        phishnet.model_bundle.FeatureEncoder dict lookups
+
+and puts them next to the model's own inference time for the same batch
+(the flattened forest the detector runs, plus scikit-learn's predict_proba
+when the bench trained the model itself). Transactions come from generate_data.py. The model is the bundle
+given with --bundle, or a small forest trained on the generated data.
+
+Usage:
+    python benchmarks/encoding_bench.py --bundle models/v0003/fraud_bundle.joblib
+"""
+import argparse
+import time
+
+import numpy as np
+
+from common import add_lambda_paths, percentiles, run_metadata, save_results, train_bench_model
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--bundle", help="model bundle to encode for (default: train a small one)")
+    parser.add_argument("--transactions", type=int, default=5000, help="transactions to encode")
+    parser.add_argument("--batch-size", type=int, default=10, help="transactions per batch (the SQS batch size)")
+    parser.add_argument("--repeats", type=int, default=3, help="passes over the transactions per method")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default="encoding_bench.json", help="where to write the JSON results")
+    return parser.parse_args()
+
+
+def load_bundle(args, generate_data, model_bundle):
+    """(bundle, scikit-learn model or None)"""
+    if args.bundle:
+        bundle, model = model_bundle.load(args.bundle), None
+    else:
+        users = generate_data.generate_user_columns(200, seed=args.seed)
+        bundle, model = train_bench_model(generate_data, users, args.seed + 1)
+    bundle["mappings"] = model_bundle.mappings(bundle)
+    return bundle, model
+
+
+def label_encoders_for(mappings, categorical_features):
+    """LabelEncoders whose transform() gives the bundle's codes, for the old code paths"""
+    from sklearn.preprocessing import LabelEncoder
+
+    encoders = {}
+    for column in categorical_features:
+        encoder = LabelEncoder()
+        # classes_ is sorted, so index -> code goes through a lookup table
+        encoder.classes_ = np.array(sorted(mappings[column]), dtype=object)
+        encoders[column] = (encoder, np.array([mappings[column][value] for value in encoder.classes_]))
+    return encoders
+
+
+def labelencoder_per_row(batch, encoders, categorical_features):
+    rows = []
+    for t in batch:
+        row = [float(t["Amount"])]
+        for column in categorical_features:
+            encoder, codes = encoders[column]
+            row.append(codes[encoder.transform([t[column]])[0]])
+        rows.append(row)
+    return np.array(rows)
+
+
+def labelencoder_batch(batch, encoders, categorical_features):
+    features = np.empty((len(batch), 1 + len(categorical_features)))
+    features[:, 0] = [float(t["Amount"]) for t in batch]
+    known = np.ones(len(batch), dtype=bool)
+    columns = []
+    for column in categorical_features:
+        values = np.array([t.get(column, "") for t in batch], dtype=object)
+        known &= np.isin(values, encoders[column][0].classes_)
+        columns.append(values)
+    for j, (column, values) in enumerate(zip(categorical_features, columns), start=1):
+        encoder, codes = encoders[column]
+        features[known, j] = codes[encoder.transform(values[known])]
+    return features
+
+
+def time_batches(function, batches, repeats):
+    """Per-batch latencies in microseconds, plus the total transactions per second"""
+    latencies = []
+    for _ in range(repeats):
+        for batch in batches:
+            start = time.perf_counter()
+            function(batch)
+            latencies.append(time.perf_counter() - start)
+    rows = repeats * sum(len(batch) for batch in batches)
+    return {
+        "batch_us": {k: v * 1e6 for k, v in percentiles(latencies).items()},
+        "transactions_per_second": rows / sum(latencies),
+    }
+
+
+def main():
+    args = parse_args()
+    add_lambda_paths()
+    import generate_data
+    from phishnet import forest, model_bundle
+
+    bundle, sklearn_model = load_bundle(args, generate_data, model_bundle)
+    categorical = model_bundle.CATEGORICAL_FEATURES
+    encoder = model_bundle.FeatureEncoder(bundle["mappings"])
+    encoders = label_encoders_for(bundle["mappings"], categorical)
+
+    # Only categories the model knows, so every method scores every row
+    users = generate_data.generate_users(200, seed=args.seed)
+    transactions = generate_data.generate_transactions(users, args.transactions, seed=args.seed + 2)
+    for t in transactions:
+        for column in categorical:
+            if t[column] not in bundle["mappings"][column]:
+                t[column] = next(iter(bundle["mappings"][column]))
+    batches = [transactions[i:i + args.batch_size] for i in range(0, len(transactions), args.batch_size)]
+
+    expected = encoder.encode(transactions)
+    assert np.array_equal(labelencoder_batch(transactions, encoders, categorical).astype(np.float32), expected)
+    assert np.array_equal(labelencoder_per_row(transactions[:100], encoders, categorical).astype(np.float32),
+                          expected[:100])
+
+    flat_forest = forest.FlatForest(bundle["forest"])
+    methods = {
+        "labelencoder_per_row": lambda batch: labelencoder_per_row(batch, encoders, categorical),
+        "labelencoder_batch": lambda batch: labelencoder_batch(batch, encoders, categorical),
+        "feature_encoder": encoder.encode,
+        "flat_forest_predict_proba": lambda batch: flat_forest.predict_proba(encoder.encode(batch)),
+    }
+    if sklearn_model is not None:
+        sklearn_model.n_jobs = 1
+        methods["sklearn_predict_proba"] = lambda batch: sklearn_model.predict_proba(encoder.encode(batch))
+    results = {"metadata": run_metadata(), "config": vars(args), "methods": {}}
+    for name, function in methods.items():
+        results["methods"][name] = summary = time_batches(function, batches, args.repeats)
+        print(f"{name:<26} p50 {summary['batch_us']['p50']:>9.1f}us/batch  "
+              f"p99 {summary['batch_us']['p99']:>9.1f}us/batch  {summary['transactions_per_second']:>12.0f} txn/s")
+
+    encoding = results["methods"]["feature_encoder"]["batch_us"]["p50"]
+    inference = results["methods"]["flat_forest_predict_proba"]["batch_us"]["p50"] - encoding
+    print(f"Encoding is {encoding / max(inference, 1e-9):.1%} of inference time per batch")
+    save_results(results, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+"""Offline evaluation of the detector's scoring modes.
+
+Scores generated, labeled transactions with the production code in
+FraudDetectionLambda:
+
+    rule     rule_scores(...) > threshold      (merchant risk, amount, location; phishnet/rules.json)
+    ml       predict_fraud_batch(...)          (the model bundle, via ModelRegistry)
+    hybrid   ml OR rule, what the Lambda alerts on
+
+and reports precision/recall/F1 per mode and per rule threshold, together
+with scoring throughput over large column chunks and per-batch latency
+through the same per-transaction code path the Lambda runs. Use it to tune
+thresholds and rules without losing recall or speed.
+
+Usage:
+    python benchmarks/evaluate_scoring.py --transactions 1000000 --model-dir models/v0003
+    python benchmarks/evaluate_scoring.py --thresholds 30,50,70,90   # trains a small model first
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from common import add_lambda_paths, percentiles, run_metadata, save_results, train_bench_model
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--transactions", type=int, default=1_000_000, help="labeled transactions to score")
+    parser.add_argument("--users", type=int, default=10_000, help="synthetic users")
+    parser.add_argument("--model-dir", help="directory with fraud_bundle.joblib (default: train a small model)")
+    parser.add_argument("--thresholds", default="50", help="comma-separated rule score thresholds to evaluate")
+    parser.add_argument("--chunk-size", type=int, default=100_000, help="transactions scored at a time")
+    parser.add_argument("--workers", type=int, default=1, help="processes generating transactions")
+    parser.add_argument("--latency-transactions", type=int, default=5000, help="transactions timed in Lambda-sized batches")
+    parser.add_argument("--batch-size", type=int, default=10, help="transactions per batch for latency")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default="evaluate_scoring.json", help="where to write the JSON results")
+    return parser.parse_args()
+
+
+def load_detector():
+    os.environ["PHISHNET_STORAGE"] = "memory"
+    os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-2")
+    add_lambda_paths()
+    import generate_data
+    import FraudDetectionLambda
+    return generate_data, FraudDetectionLambda
+
+
+def load_bundle(args, generate_data, users):
+    """The bundle as the Lambda sees it, loaded through ModelRegistry"""
+    from model_registry import ModelRegistry
+    from phishnet import model_bundle
+
+    model_dir = args.model_dir
+    if not model_dir:
+        model_dir = tempfile.mkdtemp(prefix="phishnet-eval-")
+        bundle, _ = train_bench_model(generate_data, users, args.seed + 1, transactions=200_000, trees=25)
+        model_bundle.save(bundle, os.path.join(model_dir, model_bundle.BUNDLE_FILE))
+        print("No --model-dir; trained a 25-tree model on 200k separate transactions")
+    bundle = ModelRegistry(model_dir).get()
+    if bundle is None:
+        raise SystemExit(f"Could not load a model bundle from {model_dir}")
+    return bundle
+
+
+def classification_metrics(labels, flags):
+    true_positives = int(np.sum(flags & labels))
+    false_positives = int(np.sum(flags & ~labels))
+    false_negatives = int(np.sum(~flags & labels))
+    precision = true_positives / (true_positives + false_positives) if true_positives + false_positives else 0.0
+    recall = true_positives / (true_positives + false_negatives) if true_positives + false_negatives else 0.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return {
+        "precision": precision, "recall": recall, "f1": f1, "flagged": int(np.sum(flags)),
+        "true_positives": true_positives, "false_positives": false_positives, "false_negatives": false_negatives,
+    }
+
+
+def score_chunks(args, generate_data, detector, rule_set, users, bundle):
+    """Rule scores, ML flags and labels for every transaction, plus seconds spent per mode"""
+    scores, ml_flags, labels = [], [], []
+    seconds = {"rule": 0.0, "ml": 0.0}
+
+    chunks = generate_data.generate_transaction_chunks(users, args.transactions, args.chunk_size,
+                                                       args.seed + 2, args.workers)
+    for chunk in chunks:
+        size = len(chunk["Amount"])
+        # The producer stamps each transaction with its merchant's risk weight
+        risk = rule_set.merchant_risks(chunk["Merchant"].tolist())
+        locations = chunk["Location"].tolist()
+
+        start = time.perf_counter()
+        scores.append(detector.rule_scores(chunk["Amount"], risk, locations,
+                                           np.zeros(size, dtype=bool), [None] * size, rule_set=rule_set))
+        seconds["rule"] += time.perf_counter() - start
+
+        start = time.perf_counter()
+        features = bundle["encoder"].encode_columns(chunk)
+        ml_flags.append(detector.predict_fraud_batch(None, bundle, features=features))
+        seconds["ml"] += time.perf_counter() - start
+
+        labels.append(chunk["IsFraud"].astype(bool))
+    return np.concatenate(scores), np.concatenate(ml_flags), np.concatenate(labels), seconds
+
+
+def batch_latencies(args, generate_data, detector, rule_set, users, bundle):
+    """Per-batch latency of each mode through the per-transaction code the Lambda runs"""
+    threshold = rule_set.fraud_threshold
+    transactions = generate_data.generate_transactions(users, args.latency_transactions, seed=args.seed + 3)
+    for transaction in transactions:
+        transaction["RiskScore"] = rule_set.merchant_weight(transaction["Merchant"])
+    profiles = [{"TravelMode": False} for _ in range(args.batch_size)]
+    batches = [transactions[i:i + args.batch_size] for i in range(0, len(transactions), args.batch_size)]
+
+    modes = {
+        "rule": lambda batch: detector.score_batch(batch, profiles[:len(batch)], rule_set=rule_set) > threshold,
+        "ml": lambda batch: detector.predict_fraud_batch(batch, bundle),
+        "hybrid": lambda batch: (detector.predict_fraud_batch(batch, bundle)
+                                 | (detector.score_batch(batch, profiles[:len(batch)], rule_set=rule_set) > threshold)),
+    }
+    results = {}
+    for mode, function in modes.items():
+        latencies = []
+        for batch in batches:
+            start = time.perf_counter()
+            function(batch)
+            latencies.append(time.perf_counter() - start)
+        results[mode] = {k: v * 1e6 for k, v in percentiles(latencies).items()}
+    return results
+
+
+def main():
+    args = parse_args()
+    thresholds = [float(value) for value in args.thresholds.split(",")]
+    generate_data, detector = load_detector()
+    rule_set = detector.rule_registry.get()
+    users = generate_data.generate_user_columns(args.users, seed=args.seed)
+    bundle = load_bundle(args, generate_data, users)
+
+    start = time.perf_counter()
+    scores, ml_flags, labels, seconds = score_chunks(args, generate_data, detector, rule_set, users, bundle)
+    print(f"Scored {len(labels)} transactions ({labels.mean():.1%} fraud) in "
+          f"{time.perf_counter() - start:.1f}s including generation")
+
+    results = {
+        "metadata": run_metadata(), "config": vars(args),
+        "model_version": bundle["version"], "fraud_rate": float(labels.mean()),
+        "throughput": {
+            "rule_transactions_per_second": len(labels) / seconds["rule"],
+            "ml_transactions_per_second": len(labels) / seconds["ml"],
+            "hybrid_transactions_per_second": len(labels) / (seconds["rule"] + seconds["ml"]),
+        },
+        "modes": {"ml": classification_metrics(labels, ml_flags)},
+    }
+    for threshold in thresholds:
+        rule_flags = scores > threshold
+        results["modes"][f"rule>{threshold:g}"] = classification_metrics(labels, rule_flags)
+        results["modes"][f"hybrid>{threshold:g}"] = classification_metrics(labels, rule_flags | ml_flags)
+    results["batch_latency_us"] = batch_latencies(args, generate_data, detector, rule_set, users, bundle)
+
+    print(f"{'mode':<16}{'precision':>10}{'recall':>10}{'f1':>10}{'flagged':>12}")
+    for mode, metrics in results["modes"].items():
+        print(f"{mode:<16}{metrics['precision']:>10.3f}{metrics['recall']:>10.3f}{metrics['f1']:>10.3f}"
+              f"{metrics['flagged']:>12}")
+    for mode in ("rule", "ml", "hybrid"):
+        latency = results["batch_latency_us"][mode]
+        print(f"{mode:<8} {results['throughput'][f'{mode}_transactions_per_second']:>12.0f} txn/s in bulk  "
+              f"batch of {args.batch_size}: p50 {latency['p50']:.0f}us  p99 {latency['p99']:.0f}us")
+    save_results(results, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Cold-start import profile of each Lambda handler.
+
+Runs `python -X importtime -c "import <handler>"` in a fresh interpreter per
+handler, several times, and reports the total import time and the heaviest
+individual imports. The handlers are imported against the in-memory storage
+backend, the way a cold container would load them before the first event.
+
+Usage:
+    python benchmarks/import_time.py --runs 5 --output import_time.json
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+
+from common import LAMBDA_DIRS, REPO_ROOT, run_metadata, save_results
+
+HANDLERS = {
+    "ProcessTransactionLambda": "PhishNetProcessTransaction",
+    "FraudDetectionLambda": "PhishNetFraudDetection",
+    "HandleUserResponse": "HandleUserResponse",
+    "PhishNetAddUser": "PhishNetAddUser",
+    "FraudTesterLambda": "PhishNetFraudTester",
+}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters per handler")
+    parser.add_argument("--top", type=int, default=10, help="heaviest imports to report per handler")
+    parser.add_argument("--output", default="import_time.json", help="where to write the JSON results")
+    return parser.parse_args()
+
+
+def profile_import(module, directory):
+    """One cold import. Returns {imported module: (self_us, cumulative_us)}"""
+    env = dict(os.environ, PHISHNET_STORAGE="memory", AWS_DEFAULT_REGION="us-east-2")
+    # Only the handler's own folder and the shared layer, like a deployed Lambda
+    paths = [os.path.join(REPO_ROOT, directory), os.path.join(REPO_ROOT, LAMBDA_DIRS[0])]
+    env["PYTHONPATH"] = os.pathsep.join(paths + [env.get("PYTHONPATH", "")])
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            capture_output=True, text=True, env=env, cwd=REPO_ROOT)
+    if result.returncode != 0:
+        raise RuntimeError(f"importing {module} failed:\n{result.stderr.strip().splitlines()[-1]}")
+
+    timings = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        timings[name.strip()] = (int(self_us), int(cumulative_us))
+    return timings
+
+
+def main():
+    args = parse_args()
+    results = {"metadata": run_metadata(), "runs": args.runs, "handlers": {}}
+
+    for module, directory in HANDLERS.items():
+        try:
+            runs = [profile_import(module, directory) for _ in range(args.runs)]
+        except RuntimeError as e:
+            print(f"{module}: {e}")
+            results["handlers"][module] = {"error": str(e)}
+            continue
+
+        cumulative = defaultdict(list)
+        for timings in runs:
+            for name, (_, cumulative_us) in timings.items():
+                cumulative[name].append(cumulative_us)
+        total_ms = [timings[module][1] / 1000 for timings in runs]
+        # Top-level imports of third-party packages are the ones worth deferring
+        heaviest = sorted(((name, statistics.median(values) / 1000) for name, values in cumulative.items()
+                           if name != module and "." not in name),
+                          key=lambda item: item[1], reverse=True)[:args.top]
+
+        results["handlers"][module] = {
+            "import_ms_median": statistics.median(total_ms),
+            "import_ms_max": max(total_ms),
+            "modules_imported": statistics.median(len(timings) for timings in runs),
+            "heaviest_imports_ms": dict(heaviest),
+        }
+        print(f"{module:<28} {statistics.median(total_ms):8.1f} ms  "
+              f"(heaviest: {', '.join(f'{name} {ms:.0f}ms' for name, ms in heaviest[:3])})")
+
+    save_results(results, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,268 @@
+"""End-to-end local benchmark of the fraud pipeline.
+
+Drives ProcessTransactionLambda -> SQS -> FraudDetectionLambda ->
+HandleUserResponse in one process. DynamoDB is the in-memory storage
+backend, SQS is an in-memory queue and Twilio is a stub that records the
+alerts, which are then answered through HandleUserResponse. Load comes from
+generate_transactions in Extra/data-generation/generate_data.py.
+
+Usage:
+    python benchmarks/pipeline_bench.py --transactions 5000 --output pipeline.json
+    python benchmarks/pipeline_bench.py --baseline pipeline.json   # flag regressions
+"""
+import argparse
+import contextlib
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+import urllib.parse
+from collections import Counter, deque
+from decimal import Decimal
+
+from common import add_lambda_paths, percentiles, run_metadata, save_results
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--transactions", type=int, default=2000, help="transactions to push through the pipeline")
+    parser.add_argument("--users", type=int, default=100, help="synthetic users")
+    parser.add_argument("--producer-batch", type=int, default=100, help="transactions per producer invocation")
+    parser.add_argument("--sqs-batch", type=int, default=10, help="messages per detector invocation")
+    parser.add_argument("--fat-messages", action="store_true", help="carry the full transaction in each message")
+    parser.add_argument("--model-dir", help="directory with the model artifacts (default: rules only)")
+    parser.add_argument("--trace-allocations", action="store_true", help="track allocations with tracemalloc (slower)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default="pipeline_bench.json", help="where to write the JSON results")
+    parser.add_argument("--baseline", help="earlier results to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.10,
+                        help="allowed relative slowdown vs the baseline before exiting non-zero")
+    return parser.parse_args()
+
+
+class InMemoryQueue:
+    """Stands in for the boto3 SQS client the producer calls"""
+
+    def __init__(self):
+        self.messages = deque()
+        self._next_id = 0
+
+    def send_message(self, QueueUrl, MessageBody, **kwargs):
+        return {"MessageId": self._enqueue(MessageBody)}
+
+    def send_message_batch(self, QueueUrl, Entries):
+        return {"Successful": [{"Id": entry["Id"], "MessageId": self._enqueue(entry["MessageBody"])}
+                               for entry in Entries],
+                "Failed": []}
+
+    def receive(self, max_messages):
+        batch = []
+        while self.messages and len(batch) < max_messages:
+            batch.append(self.messages.popleft())
+        return batch
+
+    def _enqueue(self, body):
+        self._next_id += 1
+        message_id = f"msg-{self._next_id}"
+        self.messages.append({"messageId": message_id, "body": body, "enqueuedAt": time.perf_counter()})
+        return message_id
+
+
+class StubTwilioClient:
+    """Records outgoing SMS instead of calling Twilio"""
+
+    def __init__(self):
+        self.sent = deque()
+        self.messages = self
+
+    def create(self, body, from_, to):
+        self.sent.append(to)
+        return type("Message", (), {"sid": f"SM{len(self.sent)}"})()
+
+
+class Stage:
+    """Latency, DynamoDB calls and (optionally) allocations for one pipeline stage"""
+
+    def __init__(self, name, storage_resource, trace_allocations):
+        self.name = name
+        self.resource = storage_resource
+        self.trace_allocations = trace_allocations
+        self.latencies = []
+        self.items = 0
+        self.busy_seconds = 0.0
+        self.dynamodb_calls = Counter()
+        self.allocated_bytes = 0
+        self.peak_bytes = 0
+
+    @contextlib.contextmanager
+    def measure(self, items=1):
+        calls_before = Counter(self.resource.calls)
+        if self.trace_allocations:
+            tracemalloc.reset_peak()
+            memory_before = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            yield
+        elapsed = time.perf_counter() - start
+        if self.trace_allocations:
+            current, peak = tracemalloc.get_traced_memory()
+            self.allocated_bytes += max(0, current - memory_before)
+            self.peak_bytes = max(self.peak_bytes, peak - memory_before)
+        self.latencies.append(elapsed)
+        self.items += items
+        self.busy_seconds += elapsed
+        self.dynamodb_calls.update(Counter(self.resource.calls) - calls_before)
+
+    def summary(self):
+        summary = {
+            "invocations": len(self.latencies),
+            "items": self.items,
+            "items_per_second": self.items / self.busy_seconds if self.busy_seconds else None,
+            "latency_ms": {k: v * 1000 if v is not None else None for k, v in percentiles(self.latencies).items()},
+            "dynamodb_calls": dict(self.dynamodb_calls),
+            "dynamodb_calls_per_item": sum(self.dynamodb_calls.values()) / self.items if self.items else None,
+        }
+        if self.trace_allocations:
+            summary["allocations"] = {"net_bytes": self.allocated_bytes, "peak_bytes": self.peak_bytes}
+        return summary
+
+
+def load_pipeline(args):
+    """Import the Lambdas against local stand-ins"""
+    os.environ["PHISHNET_STORAGE"] = "memory"
+    os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-2")
+    os.environ["ALERT_RATE_LIMIT"] = "0"
+    os.environ["FAT_MESSAGES"] = "true" if args.fat_messages else "false"
+    if args.model_dir:
+        os.environ["MODEL_DIR"] = args.model_dir
+    add_lambda_paths()
+
+    import generate_data
+    import FraudDetectionLambda
+    import HandleUserResponse
+    import ProcessTransactionLambda
+    from phishnet import storage
+    return generate_data, ProcessTransactionLambda, FraudDetectionLambda, HandleUserResponse, storage.resource()
+
+
+def run(args):
+    random.seed(args.seed)
+    generate_data, producer, detector, responder, resource = load_pipeline(args)
+
+    # Users and the transaction feed
+    users = generate_data.generate_users(args.users, seed=args.seed)
+    with resource.Table("Users").batch_writer() as writer:
+        for user in users:
+            writer.put_item(Item={"User_ID": user["UserID"], "Phone_Number": user["Phone"],
+                                  "TravelMode": False, "Status": "Active"})
+    feed = iter(generate_data.generate_transactions(users, args.transactions, seed=args.seed))
+
+    def next_transaction(user_id):
+        transaction = next(feed)
+        transaction["Amount"] = Decimal(str(transaction["Amount"]))
+        transaction["RiskScore"] = Decimal(str(producer.rules.registry.get().merchant_weight(transaction["Merchant"])))
+        return transaction
+
+    queue = InMemoryQueue()
+    twilio = StubTwilioClient()
+    producer.generate_transaction = next_transaction
+    producer.sqs = queue
+    detector.twilio_client = twilio
+    resource.reset_stats()
+
+    if args.trace_allocations:
+        tracemalloc.start()
+    stages = {name: Stage(name, resource, args.trace_allocations) for name in ("producer", "detector", "responder")}
+    end_to_end = []
+    failed_messages = 0
+    replies = Counter()
+
+    start = time.perf_counter()
+    remaining = args.transactions
+    while remaining:
+        count = min(args.producer_batch, remaining)
+        remaining -= count
+        with stages["producer"].measure(count):
+            producer.lambda_handler({"count": count} if count > 1 else {}, None)
+
+        while queue.messages:
+            records = queue.receive(args.sqs_batch)
+            with stages["detector"].measure(len(records)):
+                response = detector.lambda_handler({"Records": records}, None)
+            done = time.perf_counter()
+            end_to_end.extend(done - record["enqueuedAt"] for record in records)
+            failed_messages += len(response.get("batchItemFailures", []))
+
+        while twilio.sent:
+            phone = twilio.sent.popleft()
+            answer = random.choice(["yes", "no"])
+            body = urllib.parse.urlencode({"Body": answer, "From": phone})
+            with stages["responder"].measure():
+                responder.lambda_handler({"body": body, "isBase64Encoded": False}, None)
+            replies[answer] += 1
+    wall_seconds = time.perf_counter() - start
+    if args.trace_allocations:
+        tracemalloc.stop()
+
+    return {
+        "metadata": run_metadata(),
+        "config": vars(args),
+        "throughput": {"wall_seconds": wall_seconds, "transactions_per_second": args.transactions / wall_seconds},
+        "end_to_end_latency_ms": {k: v * 1000 if v is not None else None for k, v in percentiles(end_to_end).items()},
+        "stages": {name: stage.summary() for name, stage in stages.items()},
+        "alerts_sent": stages["responder"].items,
+        "replies": dict(replies),
+        "failed_messages": failed_messages,
+        "dynamodb_calls_total": dict(resource.calls),
+    }
+
+
+def compare(results, baseline, max_regression):
+    """Print how results moved against a baseline; returns the regressions found"""
+    regressions = []
+    old_tps = baseline["throughput"]["transactions_per_second"]
+    new_tps = results["throughput"]["transactions_per_second"]
+    print(f"{'metric':<32}{'baseline':>12}{'current':>12}{'change':>10}")
+    rows = [("throughput (txn/s)", old_tps, new_tps, True)]
+    for name, stage in results["stages"].items():
+        old_stage = baseline["stages"].get(name)
+        if old_stage and old_stage["latency_ms"]["p95"] and stage["latency_ms"]["p95"]:
+            rows.append((f"{name} p95 (ms)", old_stage["latency_ms"]["p95"], stage["latency_ms"]["p95"], False))
+    for label, old, new, higher_is_better in rows:
+        change = (new - old) / old if old else 0.0
+        print(f"{label:<32}{old:>12.3f}{new:>12.3f}{change:>+10.1%}")
+        if (change < -max_regression) if higher_is_better else (change > max_regression):
+            regressions.append(label)
+    return regressions
+
+
+def main():
+    args = parse_args()
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    results = run(args)
+
+    print(f"{args.transactions} transactions in {results['throughput']['wall_seconds']:.2f}s "
+          f"({results['throughput']['transactions_per_second']:.0f} txn/s), "
+          f"{results['alerts_sent']} alerts, {results['failed_messages']} failed messages")
+    for name, stage in results["stages"].items():
+        latency = stage["latency_ms"]
+        if stage["invocations"]:
+            print(f"  {name:<10} {stage['invocations']:>6} invocations  p50 {latency['p50']:.2f}ms  "
+                  f"p95 {latency['p95']:.2f}ms  p99 {latency['p99']:.2f}ms  "
+                  f"{stage['dynamodb_calls_per_item']:.2f} DynamoDB calls/item")
+    save_results(results, args.output)
+
+    if baseline:
+        regressions = compare(results, baseline, args.max_regression)
+        if regressions:
+            print(f"Regressions beyond {args.max_regression:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
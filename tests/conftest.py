@@ -0,0 +1,27 @@
+"""Every test runs against the in-memory storage backend (PHISHNET_STORAGE=memory)."""
+import os
+import sys
+
+import pytest
+
+os.environ["PHISHNET_STORAGE"] = "memory"
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-2")
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for directory in ("PhishNetCommon", "PhishNetFraudDetection", "HandleUserResponse", "PhishNetProcessTransaction"):
+    path = os.path.join(REPO_ROOT, directory)
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+from phishnet import storage  # noqa: E402
+
+
+@pytest.fixture
+def memory():
+    """The shared MemoryResource, emptied. Tables are cleared rather than
+    replaced because the Lambdas hold on to their table handles."""
+    resource = storage.resource()
+    for table in resource.tables.values():
+        table.items.clear()
+    resource.reset_stats()
+    return resource
@@ -0,0 +1,224 @@
+"""FraudDetectionLambda end to end on the in-memory tables: SQS batch item
+failures and the alert claim, release and lease."""
+import json
+from decimal import Decimal
+
+import pytest
+
+import FraudDetectionLambda as detector
+import prefetch
+from user_cache import UserProfileCache
+
+
+@pytest.fixture
+def sms(memory, monkeypatch):
+    """Sent messages; set sms.fail to make every send raise"""
+    class Outbox(list):
+        fail = False
+
+    outbox = Outbox()
+
+    def send(phone_number, body):
+        if outbox.fail:
+            raise RuntimeError("Twilio is down")
+        outbox.append((phone_number, body))
+        return f"SM{len(outbox)}"
+
+    monkeypatch.setattr(detector.alert_dispatcher, "send", send)
+    monkeypatch.setattr(detector.alert_dispatcher.rate_limiter, "interval", 0.0)
+    monkeypatch.setattr(detector, "user_cache", UserProfileCache())
+    detector.users_table.put_item(Item={"User_ID": "u1", "Phone_Number": "+15550001"})
+    return outbox
+
+
+def add_transaction(transaction_id, fraudulent=True):
+    # Dubai is a high-risk location, so a risky merchant puts the rule score over the threshold
+    detector.transactions_table.put_item(Item={
+        "TransactionID": transaction_id, "UserID": "u1", "Amount": Decimal("25.00"),
+        "Merchant": "Target", "RiskScore": Decimal("0.4") if fraudulent else Decimal("0"),
+        "Location": "Dubai" if fraudulent else "Chicago", "Timestamp": "2026-10-18T12:00:00",
+        "Status": "Pending",
+    })
+
+
+def event(*bodies):
+    return {"Records": [{"messageId": f"m{i}", "body": body} for i, body in enumerate(bodies)]}
+
+
+def message(transaction_id):
+    return json.dumps({"TransactionID": transaction_id})
+
+
+def status(transaction_id):
+    return detector.transactions_table.get_item(Key={"TransactionID": transaction_id})["Item"]
+
+
+def test_malformed_messages_are_dropped_not_retried(sms):
+    add_transaction("t1", fraudulent=False)
+    detector.transactions_table.put_item(Item={"TransactionID": "t2", "UserID": "u1"})
+    # Undecodable JSON, an unknown transaction and one without an Amount fail the same way every time
+    response = detector.lambda_handler(
+        event(message("t1"), "{not json", message("unknown"), message("t2")), None)
+    assert response == {"batchItemFailures": []}
+    assert sms == []
+
+
+def test_throttled_transactions_are_retried(sms, memory, monkeypatch):
+    add_transaction("t1", fraudulent=False)
+
+    def throttled(RequestItems):
+        return {"Responses": {}, "UnprocessedKeys": RequestItems}
+
+    monkeypatch.setattr(memory, "batch_get_item", throttled)
+    monkeypatch.setattr(prefetch, "BASE_BACKOFF_SECONDS", 0.0)
+    response = detector.lambda_handler(event(message("t1")), None)
+    assert response == {"batchItemFailures": [{"itemIdentifier": "m0"}]}
+
+
+def test_fraud_is_alerted_once_across_redeliveries(sms):
+    add_transaction("t1")
+    assert detector.lambda_handler(event(message("t1")), None) == {"batchItemFailures": []}
+    assert detector.lambda_handler(event(message("t1")), None) == {"batchItemFailures": []}
+    assert len(sms) == 1
+    item = status("t1")
+    assert item["Status"] == "Sent to User"
+    assert "ClaimExpiresAt" not in item
+    mapping = detector.mapping_table.get_item(Key={"PhoneNumber": "+15550001", "TransactionID": "t1"})
+    assert mapping["Item"]["Status"] == "Sent to User"
+
+
+def set_travel(enabled, location="Dubai"):
+    detector.users_table.update_item(
+        Key={"User_ID": "u1"}, UpdateExpression="SET TravelMode = :on, TravelLocation = :loc ADD ProfileVersion :one",
+        ExpressionAttributeValues={":on": enabled, ":loc": location, ":one": 1})
+
+
+def warm_profile():
+    """Cache the user's profile as an earlier invocation would have"""
+    detector.user_cache.put_many({"u1": detector.users_table.get_item(Key={"User_ID": "u1"})["Item"]})
+
+
+def test_travel_mode_turned_on_clears_every_transaction_in_a_batch(sms):
+    warm_profile()
+    set_travel(True)
+    add_transaction("t1")
+    add_transaction("t2")
+    detector.lambda_handler(event(message("t1"), message("t2")), None)
+    assert sms == []
+
+
+def test_travel_mode_turned_off_alerts_every_transaction_in_a_batch(sms):
+    set_travel(True)
+    warm_profile()
+    set_travel(False)
+    add_transaction("t1")
+    add_transaction("t2")
+    detector.lambda_handler(event(message("t1"), message("t2")), None)
+    assert len(sms) == 2
+
+
+def test_failed_send_releases_the_claim_and_is_retried(sms):
+    add_transaction("t1")
+    sms.fail = True
+    response = detector.lambda_handler(event(message("t1")), None)
+    assert response == {"batchItemFailures": [{"itemIdentifier": "m0"}]}
+    assert status("t1")["Status"] == "Pending"
+
+    sms.fail = False
+    assert detector.lambda_handler(event(message("t1")), None) == {"batchItemFailures": []}
+    assert len(sms) == 1
+    assert status("t1")["Status"] == "Sent to User"
+
+
+def test_claim_left_by_a_crash_is_taken_over_after_the_lease(memory):
+    add_transaction("t1")
+    assert detector.claim_alert("t1", now=1000) == detector.CLAIMED
+    # The claimer died before sending: nobody else may send until the lease runs out
+    assert detector.claim_alert("t1", now=1001) == detector.CLAIM_HELD
+    assert detector.claim_alert("t1", now=1000 + detector.ALERT_CLAIM_LEASE_SECONDS + 1) == detector.CLAIMED
+
+    detector.confirm_alert("t1")
+    assert detector.claim_alert("t1", now=10 ** 10) == detector.ALREADY_SENT
+
+
+def test_message_is_retried_while_another_delivery_holds_the_claim(sms):
+    add_transaction("t1")
+    detector.claim_alert("t1")
+    response = detector.lambda_handler(event(message("t1")), None)
+    assert response == {"batchItemFailures": [{"itemIdentifier": "m0"}]}
+    assert sms == []
+
+    # Once the lease has run out, the retry takes the claim over and sends
+    detector.transactions_table.update_item(Key={"TransactionID": "t1"}, UpdateExpression="SET ClaimExpiresAt = :past",
+                                            ExpressionAttributeValues={":past": 0})
+    assert detector.lambda_handler(event(message("t1")), None) == {"batchItemFailures": []}
+    assert len(sms) == 1
+
+
+def test_redeliveries_are_not_counted_towards_velocity(sms):
+    add_transaction("t1", fraudulent=False)
+    for _ in range(8):
+        detector.lambda_handler(event(message("t1")), None)
+    transaction = status("t1")
+    timestamp = detector.feature_store.transaction_time(transaction)
+    counters = detector.velocity.load(detector.dynamodb, [transaction], [timestamp],
+                                      detector.rule_registry.get().velocity_rules)
+    assert {item["Count"] for item in counters.values()} == {1}
+    assert sms == []
+
+
+def test_redelivery_after_another_transaction_is_not_counted_again(sms):
+    add_transaction("t1", fraudulent=False)
+    add_transaction("t2", fraudulent=False)
+    for transaction_id in ("t1", "t2", "t1"):
+        detector.lambda_handler(event(message(transaction_id)), None)
+    transactions = [status("t1")]
+    timestamps = [detector.feature_store.transaction_time(transactions[0])]
+    counters = detector.velocity.load(detector.dynamodb, transactions, timestamps,
+                                      detector.rule_registry.get().velocity_rules)
+    assert {item["Count"] for item in counters.values()} == {2}
+
+
+def test_velocity_updates_are_coalesced_per_counter(memory):
+    transactions = [{"TransactionID": f"t{i}", "UserID": f"u{i % 2}", "Merchant": "Target", "Amount": "10"}
+                    for i in range(10)]
+    rules = detector.rule_registry.get().velocity_rules
+    memory.reset_stats()
+    # Two users and one merchant, all in the same buckets
+    assert detector.velocity.record(detector.write_pool, transactions, [1000.0] * 10, rules) == 5
+    assert memory.calls["VelocityCounters.update_item"] == 5
+    counters = detector.velocity.load(memory, transactions, [1000.0] * 10, rules)
+    merchant = [item for counter, item in counters.items() if counter.startswith("merchant#")]
+    assert [(item["Count"], item["Amount"]) for item in merchant] == [(10, 100)]
+
+
+def add_trip():
+    # Neither transaction is risky on its own; London is high-risk but scores under the threshold alone
+    for transaction_id, location, timestamp in (("t1", "Chicago", "2026-10-18T12:00:00"),
+                                                ("t2", "London", "2026-10-18T12:01:00")):
+        detector.transactions_table.put_item(Item={
+            "TransactionID": transaction_id, "UserID": "u1", "Amount": Decimal("25.00"), "Merchant": "Target",
+            "RiskScore": Decimal("0"), "Location": location, "Timestamp": timestamp, "Status": "Pending",
+        })
+
+
+def test_impossible_travel_within_one_batch(sms):
+    add_trip()
+    # Delivered out of order in the same batch
+    detector.lambda_handler(event(message("t2"), message("t1")), None)
+    assert status("t2")["Status"] == "Sent to User"
+    assert status("t1")["Status"] == "Pending"
+    assert len(sms) == 1
+
+
+def test_retried_message_is_not_scored_against_itself(sms):
+    add_trip()
+    detector.lambda_handler(event(message("t1")), None)
+    sms.fail = True
+    assert detector.lambda_handler(event(message("t2")), None) == {"batchItemFailures": [{"itemIdentifier": "m0"}]}
+
+    # The retry still compares London with Chicago, not with itself
+    sms.fail = False
+    assert detector.lambda_handler(event(message("t2")), None) == {"batchItemFailures": []}
+    assert len(sms) == 1
+    assert status("t2")["Status"] == "Sent to User"
@@ -0,0 +1,28 @@
+import pytest
+
+from phishnet import locations
+
+
+@pytest.mark.parametrize("name, city", [
+    ("Tokyo", "Tokyo"),
+    ("tokoyo", "Tokyo"),
+    ("Lodnon", "London"),
+    ("Dubia", "Dubai"),
+    ("Olso", "Oslo"),
+    ("NYC", "New York"),
+    ("sao paulo", "São Paulo"),
+    ("Chicgo", "Chicago"),
+])
+def test_typos_and_aliases_resolve(name, city):
+    assert locations.canonical_name(name) == city
+
+
+@pytest.mark.parametrize("name", ["Laos", "Parks", "Perth", "Austria", "Lake Amy", "", None])
+def test_other_places_do_not_resolve_to_a_listed_city(name):
+    assert locations.canonical_name(name) is None
+
+
+def test_ids_compare_equal_for_the_same_place():
+    assert locations.location_id("tokoyo") == locations.location_id("Tokyo")
+    assert locations.location_id("Reykjavik") == locations.location_id(" reykjavik")
+    assert locations.location_id("Laos") != locations.location_id("Lagos")
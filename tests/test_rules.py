@@ -0,0 +1,54 @@
+import copy
+import json
+
+import pytest
+
+import feature_store
+from phishnet import rules
+
+with open(rules.RULES_PATH) as f:
+    SHIPPED = json.load(f)
+
+
+def broken(change):
+    config = copy.deepcopy(SHIPPED)
+    change(config)
+    return config
+
+
+def test_shipped_rules_compile():
+    rule_set = rules.RuleSet(SHIPPED)
+    assert rule_set.behavior["window"] in feature_store.WINDOWS
+    assert set(rules.BEHAVIOR_WINDOWS) == set(feature_store.WINDOWS)
+
+
+@pytest.mark.parametrize("change", [
+    lambda c: c["velocity"][0].pop("window"),
+    lambda c: c["velocity"][0].update(bucket=0),
+    lambda c: c["velocity"][0].update(window=601),
+    lambda c: c["velocity"][0].update(window="600"),
+    lambda c: c["velocity"][0].update(limit=None),
+    lambda c: c["velocity"][0].pop("score"),
+    lambda c: c["velocity"][0].update(subject="card"),
+    lambda c: c["velocity"][0].pop("name"),
+    lambda c: c["behavior"].pop("min_history"),
+    lambda c: c["behavior"].update(zscore_limit="3"),
+    lambda c: c["behavior"].update(window="7d"),
+    lambda c: c["impossible_travel"].pop("max_speed_kmh"),
+    lambda c: c["impossible_travel"].update(score=True),
+    lambda c: c.pop("behavior"),
+    lambda c: c.update(fraud_threshold="high"),
+])
+def test_every_broken_setting_is_a_rules_error(change):
+    with pytest.raises(rules.RulesError):
+        rules.RuleSet(broken(change))
+
+
+def test_registry_keeps_the_previous_rules_when_a_reload_is_invalid(tmp_path):
+    path = tmp_path / "rules.json"
+    path.write_text(json.dumps(SHIPPED))
+    registry = rules.RuleRegistry(str(path), reload_seconds=0)
+    loaded = registry.get()
+
+    path.write_text(json.dumps(broken(lambda c: c["velocity"][0].pop("window"))))
+    assert registry.get() is loaded
@@ -0,0 +1,181 @@
+"""The in-memory backend against the DynamoDB behaviour the Lambdas and benchmarks rely on."""
+from decimal import Decimal
+
+import pytest
+
+from phishnet import storage
+
+
+@pytest.fixture
+def table(memory):
+    return memory.create_table("ConformanceTable", "PK")
+
+
+@pytest.fixture
+def sorted_table(memory):
+    return memory.create_table("ConformanceSorted", "PK", "SK")
+
+
+def fill(table, count):
+    for i in range(count):
+        table.put_item(Item={"PK": f"item{i:03d}", "N": i, "Even": i % 2 == 0})
+
+
+def test_conditional_check_failure_is_shaped_like_a_client_error(table):
+    table.put_item(Item={"PK": "a", "Status": "Pending"})
+    with pytest.raises(storage.StorageError) as raised:
+        table.update_item(Key={"PK": "a"}, UpdateExpression="SET #s = :to", ConditionExpression="#s = :from",
+                          ExpressionAttributeNames={"#s": "Status"},
+                          ExpressionAttributeValues={":from": "Sent to User", ":to": "Pending"})
+    error = raised.value
+    assert error.response["Error"]["Code"] == "ConditionalCheckFailedException"
+    assert storage.is_conditional_check_failure(error)
+    assert "ConditionalCheckFailedException" in str(error)
+    # A failed condition leaves the item as it was
+    assert table.get_item(Key={"PK": "a"})["Item"] == {"PK": "a", "Status": "Pending"}
+
+
+def test_condition_on_a_missing_item(table):
+    table.put_item(Item={"PK": "a"}, ConditionExpression="attribute_not_exists(PK)")
+    with pytest.raises(storage.ConditionalCheckFailed):
+        table.put_item(Item={"PK": "a"}, ConditionExpression="attribute_not_exists(PK)")
+    with pytest.raises(storage.ConditionalCheckFailed):
+        table.delete_item(Key={"PK": "missing"}, ConditionExpression="attribute_exists(PK)")
+
+
+def test_other_errors_are_not_conditional_check_failures(table):
+    with pytest.raises(storage.ValidationError) as raised:
+        table.update_item(Key={"PK": "a"}, UpdateExpression="SET Total = :x")
+    assert raised.value.response["Error"]["Code"] == "ValidationException"
+    assert not storage.is_conditional_check_failure(raised.value)
+
+
+def test_add_to_numbers(table):
+    for _ in range(3):
+        table.update_item(Key={"PK": "a"}, UpdateExpression="ADD #c :one, Amount :amount",
+                          ExpressionAttributeNames={"#c": "Count"},
+                          ExpressionAttributeValues={":one": 1, ":amount": Decimal("2.5")})
+    item = table.get_item(Key={"PK": "a"})["Item"]
+    assert item["Count"] == Decimal(3)
+    assert item["Amount"] == Decimal("7.5")
+
+
+def test_add_to_sets(table):
+    table.update_item(Key={"PK": "a"}, UpdateExpression="ADD Merchants :m",
+                      ExpressionAttributeValues={":m": {"Amazon", "Target"}})
+    table.update_item(Key={"PK": "a"}, UpdateExpression="ADD Merchants :m",
+                      ExpressionAttributeValues={":m": {"Target", "Walmart"}})
+    assert table.get_item(Key={"PK": "a"})["Item"]["Merchants"] == {"Amazon", "Target", "Walmart"}
+
+
+def test_add_rejects_other_types(table):
+    with pytest.raises(storage.ValidationError):
+        table.update_item(Key={"PK": "a"}, UpdateExpression="ADD Name :name",
+                          ExpressionAttributeValues={":name": "text"})
+
+
+def test_set_and_remove_in_one_expression(table):
+    table.put_item(Item={"PK": "a", "Old": 1, "Keep": 2, "Total": 10})
+    table.update_item(Key={"PK": "a"}, UpdateExpression="SET New = :v, Total = Total + :d REMOVE Old",
+                      ExpressionAttributeValues={":v": "x", ":d": 5})
+    assert table.get_item(Key={"PK": "a"})["Item"] == {"PK": "a", "Keep": 2, "New": "x", "Total": 15}
+
+
+def test_update_sees_the_item_as_it_was(table):
+    table.put_item(Item={"PK": "a", "A": 1, "B": 2})
+    table.update_item(Key={"PK": "a"}, UpdateExpression="SET A = B, B = A")
+    item = table.get_item(Key={"PK": "a"})["Item"]
+    assert (item["A"], item["B"]) == (2, 1)
+
+
+def test_update_return_values(table):
+    table.put_item(Item={"PK": "a", "N": 1})
+    response = table.update_item(Key={"PK": "a"}, UpdateExpression="ADD N :one",
+                                 ExpressionAttributeValues={":one": 1}, ReturnValues="UPDATED_NEW")
+    assert response == {"Attributes": {"N": Decimal(2)}}
+
+
+def test_key_attributes_cannot_be_updated(table):
+    with pytest.raises(storage.ValidationError):
+        table.update_item(Key={"PK": "a"}, UpdateExpression="SET PK = :other",
+                          ExpressionAttributeValues={":other": "b"})
+
+
+def test_floats_are_rejected(table):
+    with pytest.raises(TypeError):
+        table.put_item(Item={"PK": "a", "Amount": 1.5})
+
+
+def test_limit_applies_before_filter(table):
+    fill(table, 10)
+    response = table.scan(Limit=4, FilterExpression="Even = :t", ExpressionAttributeValues={":t": True})
+    assert response["ScannedCount"] == 4
+    assert response["Count"] == len(response["Items"]) <= 4
+    assert all(item["Even"] for item in response["Items"])
+    assert "LastEvaluatedKey" in response
+
+
+def test_scan_pages_with_exclusive_start_key(table):
+    fill(table, 25)
+    seen, kwargs, pages = [], {"Limit": 7}, 0
+    while True:
+        response = table.scan(**kwargs)
+        seen.extend(item["PK"] for item in response["Items"])
+        pages += 1
+        if "LastEvaluatedKey" not in response:
+            break
+        kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+    assert sorted(seen) == [f"item{i:03d}" for i in range(25)]
+    assert pages == 4
+
+
+def test_filtered_pages_still_cover_every_match(table):
+    fill(table, 25)
+    seen, kwargs = [], {"Limit": 6, "FilterExpression": "N >= :low", "ExpressionAttributeValues": {":low": 20}}
+    while True:
+        response = table.scan(**kwargs)
+        seen.extend(item["N"] for item in response["Items"])
+        if "LastEvaluatedKey" not in response:
+            break
+        kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+    assert sorted(seen) == [20, 21, 22, 23, 24]
+
+
+def test_scan_segments_cover_the_table_exactly_once(table):
+    fill(table, 50)
+    seen = []
+    for segment in range(4):
+        seen.extend(item["PK"] for item in table.scan(Segment=segment, TotalSegments=4)["Items"])
+    assert sorted(seen) == [f"item{i:03d}" for i in range(50)]
+
+
+def test_query_orders_and_pages_by_sort_key(sorted_table):
+    for i in range(6):
+        sorted_table.put_item(Item={"PK": "phone", "SK": f"t{i}"})
+    sorted_table.put_item(Item={"PK": "other", "SK": "t9"})
+
+    response = sorted_table.query(KeyConditionExpression="PK = :p", ExpressionAttributeValues={":p": "phone"},
+                                  ScanIndexForward=False, Limit=4)
+    assert [item["SK"] for item in response["Items"]] == ["t5", "t4", "t3", "t2"]
+
+    rest = sorted_table.query(KeyConditionExpression="PK = :p", ExpressionAttributeValues={":p": "phone"},
+                              ScanIndexForward=False, ExclusiveStartKey=response["LastEvaluatedKey"])
+    assert [item["SK"] for item in rest["Items"]] == ["t1", "t0"]
+    assert "LastEvaluatedKey" not in rest
+
+
+def test_projection(table):
+    table.put_item(Item={"PK": "a", "Name": "x", "Secret": "y"})
+    response = table.get_item(Key={"PK": "a"}, ProjectionExpression="#n", ExpressionAttributeNames={"#n": "Name"})
+    assert response["Item"] == {"Name": "x"}
+
+
+def test_batch_get_item(memory, table):
+    fill(table, 3)
+    response = memory.batch_get_item(RequestItems={
+        "ConformanceTable": {"Keys": [{"PK": "item000"}, {"PK": "item002"}, {"PK": "missing"}]},
+    })
+    assert sorted(item["PK"] for item in response["Responses"]["ConformanceTable"]) == ["item000", "item002"]
+    assert response["UnprocessedKeys"] == {}
+    with pytest.raises(storage.ValidationError):
+        memory.batch_get_item(RequestItems={"ConformanceTable": {"Keys": [{"PK": str(i)} for i in range(101)]}})